@@ -0,0 +1,321 @@
+"""
+Model backends behind bedrock.py's ask_* functions.
+
+A backend opens a streaming chat request and yields events shaped like
+Bedrock Converse stream events, so resume, early stop and metrics in
+bedrock._stream() work the same for every backend:
+
+    {"contentBlockDelta": {"delta": {"text": "..."}}}
+    {"messageStop": {"stopReason": "end_turn" | "max_tokens" | "stop_sequence"}}
+    {"metadata": {"usage": {"inputTokens": n, "outputTokens": n}}}
+
+Messages use the Bedrock message format throughout the app; backends translate.
+
+    BedrockBackend       AWS Bedrock Converse (default)
+    OpenAICompatBackend  local OpenAI-compatible server, e.g. llama.cpp's
+                         `llama-server`, for low-latency offline use
+
+MODEL_BACKEND selects one; clients are created on first use, not at import.
+"""
+import base64
+import http.client
+import json
+import logging
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from config import (
+    MODEL_BACKEND, AWS_REGION, AWS_PROFILE, BEDROCK_MODEL, DRAFT_MODEL, BEDROCK_POOL_CONNECTIONS,
+    LOCAL_BASE_URL, LOCAL_MODEL, LOCAL_DRAFT_MODEL, LOCAL_API_KEY, LOCAL_TIMEOUT_S, WARM_WINDOW_S,
+)
+
+logger = logging.getLogger(__name__)
+
+# Errors a backend's event stream may raise mid-read that are worth resuming
+RESUMABLE_READ_ERRORS = (OSError, http.client.HTTPException)
+
+
+class BedrockThrottled(RuntimeError):
+    """The model backend rejected the request for exceeding its rate/token quota."""
+
+
+class ModelBackend:
+    """Interface for streaming chat backends."""
+
+    name = "base"
+    default_model = None
+    draft_model = None
+    # True if a trailing assistant message is continued (prefill) rather than
+    # answered afresh; bedrock._stream() only resumes broken streams when it is
+    supports_prefill = False
+
+    def open_stream(self, model_id: str, system: list, messages: list, inference_config: dict):
+        """Starts a streaming request; returns an iterable of Converse-style events."""
+        raise NotImplementedError
+
+    def health(self):
+        """Minimal round trip; raises RuntimeError if the backend is unusable."""
+        raise NotImplementedError
+
+    def is_resumable(self, error: Exception) -> bool:
+        """True if error, raised while reading a stream, is worth a continuation request."""
+        return isinstance(error, RESUMABLE_READ_ERRORS)
+
+    def translate_error(self, error: Exception) -> Exception:
+        """A RuntimeError (or BedrockThrottled) describing error, or error itself if unknown."""
+        return error
+
+    def mark_used(self) -> bool:
+        """Records a request; returns True if connections were warm."""
+        return True
+
+    def ensure_pool(self, connections: int):
+        pass
+
+    def prewarm(self, connections: int):
+        pass
+
+    def start_keepwarm(self):
+        pass
+
+
+class BedrockBackend(ModelBackend):
+    name = "bedrock"
+    default_model = BEDROCK_MODEL
+    draft_model = DRAFT_MODEL
+    supports_prefill = True
+
+    _KNOWN_PREFIXES = ("anthropic.claude", "us.anthropic.claude")
+    _THROTTLE_CODES = {"throttlingexception", "toomanyrequestsexception", "servicequotaexceededexception"}
+    # Mid-stream error events that are worth resuming (others are raised as-is).
+    # Throttling is not among them: an immediate continuation would be throttled
+    # too, so it surfaces as BedrockThrottled and the caller backs off.
+    _RESUMABLE_STREAM_ERRORS = {
+        "modelstreamerrorexception",
+        "internalserverexception",
+        "serviceunavailableexception",
+    }
+
+    def __init__(self):
+        from bedrock_client import ClientManager
+
+        if not BEDROCK_MODEL.startswith(self._KNOWN_PREFIXES):
+            logger.warning(
+                "BEDROCK_MODEL '%s' does not start with a known Claude prefix (%s). "
+                "Verify the model ID is correct.",
+                BEDROCK_MODEL,
+                ", ".join(self._KNOWN_PREFIXES),
+            )
+        self.clients = ClientManager(AWS_PROFILE, AWS_REGION, BEDROCK_POOL_CONNECTIONS)
+
+    def open_stream(self, model_id, system, messages, inference_config):
+        from botocore.exceptions import ClientError
+        from bedrock_client import is_expired_credentials
+
+        kwargs = dict(modelId=model_id, system=system, messages=messages, inferenceConfig=inference_config)
+        try:
+            return self.clients.client.converse_stream(**kwargs)["stream"]
+        except ClientError as e:
+            if not is_expired_credentials(e):
+                raise
+            logger.warning("Bedrock credentials expired; reloading profile and retrying")
+            self.clients.rebuild()
+            return self.clients.client.converse_stream(**kwargs)["stream"]
+
+    def health(self):
+        from botocore.exceptions import ClientError, BotoCoreError
+
+        self.clients.mark_used()
+        try:
+            self.clients.client.converse(
+                modelId=BEDROCK_MODEL,
+                messages=[{"role": "user", "content": [{"text": "hi"}]}],
+                inferenceConfig={"maxTokens": 1},
+            )
+        except ClientError as e:
+            error_code = e.response["Error"]["Code"]
+            raise RuntimeError(f"Bedrock connection failed ({error_code}): {e}") from e
+        except BotoCoreError as e:
+            raise RuntimeError(f"AWS SDK error: {e}") from e
+
+    def is_resumable(self, error: Exception) -> bool:
+        from botocore.exceptions import ClientError, BotoCoreError
+        from urllib3.exceptions import HTTPError
+
+        if isinstance(error, BotoCoreError):
+            return True
+        if isinstance(error, ClientError):
+            return error.response["Error"]["Code"].lower() in self._RESUMABLE_STREAM_ERRORS
+        # urllib3 / http.client / socket errors can leak out of the event stream iterator
+        return isinstance(error, (*RESUMABLE_READ_ERRORS, HTTPError))
+
+    def translate_error(self, error: Exception) -> Exception:
+        from botocore.exceptions import ClientError, BotoCoreError
+
+        if isinstance(error, ClientError):
+            error_code = error.response["Error"]["Code"]
+            if error_code.lower() in self._THROTTLE_CODES:
+                return BedrockThrottled(f"Bedrock throttled ({error_code}): {error}")
+            return RuntimeError(f"Bedrock API error ({error_code}): {error}")
+        if isinstance(error, BotoCoreError):
+            return RuntimeError(f"AWS SDK error: {error}")
+        return error
+
+    def mark_used(self) -> bool:
+        return self.clients.mark_used()
+
+    def ensure_pool(self, connections: int):
+        self.clients.ensure_pool(connections)
+
+    def prewarm(self, connections: int):
+        self.clients.prewarm(connections)
+
+    def start_keepwarm(self):
+        self.clients.start_keepwarm()
+
+
+# Bedrock stop reasons for OpenAI finish_reason values
+_FINISH_REASONS = {"stop": "end_turn", "length": "max_tokens", "content_filter": "content_filtered"}
+
+
+class OpenAICompatBackend(ModelBackend):
+    """
+    POST {LOCAL_BASE_URL}/v1/chat/completions with stream=true, reading the
+    server-sent event lines. Uses only the standard library.
+
+    OpenAI-style servers answer a trailing assistant message afresh instead of
+    continuing it, so broken streams are not resumed (supports_prefill=False).
+    """
+
+    name = "openai"
+    default_model = LOCAL_MODEL
+    draft_model = LOCAL_DRAFT_MODEL
+
+    def __init__(self, base_url: str = LOCAL_BASE_URL, api_key: str = LOCAL_API_KEY,
+                 timeout: float = LOCAL_TIMEOUT_S):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.timeout = timeout
+        self._last_used = 0.0
+        self._lock = threading.Lock()
+
+    def _request(self, path: str, payload: dict = None) -> urllib.request.Request:
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        data = json.dumps(payload).encode() if payload is not None else None
+        return urllib.request.Request(self.base_url + path, data=data, headers=headers)
+
+    def _open(self, request: urllib.request.Request):
+        try:
+            return urllib.request.urlopen(request, timeout=self.timeout)
+        except urllib.error.HTTPError as e:
+            body = e.read().decode(errors="replace")[:500]
+            if e.code == 429:
+                raise BedrockThrottled(f"Local model throttled (429): {body}") from e
+            raise RuntimeError(f"Local model error ({e.code}): {body}") from e
+        except (urllib.error.URLError, OSError) as e:
+            raise RuntimeError(f"Local model server unreachable at {self.base_url}: {e}") from e
+
+    @staticmethod
+    def _to_openai_messages(system: list, messages: list) -> list:
+        converted = []
+        system_text = "\n".join(block["text"] for block in system if "text" in block)
+        if system_text:
+            converted.append({"role": "system", "content": system_text})
+        for message in messages:
+            parts = []
+            for block in message["content"]:
+                if "text" in block:
+                    parts.append({"type": "text", "text": block["text"]})
+                elif "image" in block:
+                    image = block["image"]
+                    data = base64.standard_b64encode(image["source"]["bytes"]).decode()
+                    parts.append({"type": "image_url",
+                                  "image_url": {"url": f"data:image/{image['format']};base64,{data}"}})
+            if all(part["type"] == "text" for part in parts):
+                # Plain string content is accepted by every OpenAI-compatible server
+                converted.append({"role": message["role"], "content": "".join(p["text"] for p in parts)})
+            else:
+                converted.append({"role": message["role"], "content": parts})
+        return converted
+
+    def open_stream(self, model_id, system, messages, inference_config):
+        payload = {
+            "model": model_id,
+            "messages": self._to_openai_messages(system, messages),
+            "max_tokens": inference_config["maxTokens"],
+            "stream": True,
+            "stream_options": {"include_usage": True},
+        }
+        if inference_config.get("stopSequences"):
+            payload["stop"] = inference_config["stopSequences"]
+        response = self._open(self._request("/v1/chat/completions", payload))
+        return self._events(response)
+
+    @staticmethod
+    def _events(response):
+        """Translates chat.completion.chunk SSE lines into Converse-style events."""
+        try:
+            for raw in response:
+                line = raw.decode("utf-8").strip()
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                chunk = json.loads(data)
+                for choice in chunk.get("choices") or []:
+                    text = (choice.get("delta") or {}).get("content")
+                    if text:
+                        yield {"contentBlockDelta": {"delta": {"text": text}}}
+                    reason = choice.get("finish_reason")
+                    if reason:
+                        yield {"messageStop": {"stopReason": _FINISH_REASONS.get(reason, reason)}}
+                usage = chunk.get("usage")
+                if usage:
+                    yield {"metadata": {"usage": {
+                        "inputTokens": usage.get("prompt_tokens", 0),
+                        "outputTokens": usage.get("completion_tokens", 0),
+                    }}}
+        finally:
+            response.close()
+
+    def translate_error(self, error: Exception) -> Exception:
+        if isinstance(error, RuntimeError):
+            return error  # already described by _open()
+        if isinstance(error, (*RESUMABLE_READ_ERRORS, json.JSONDecodeError)):
+            return RuntimeError(f"Local model stream failed: {error}")
+        return error
+
+    def health(self):
+        with self._open(self._request("/v1/models")) as response:
+            response.read()
+        self.mark_used()
+
+    def mark_used(self) -> bool:
+        # Local sockets are cheap; "warm" just means the server answered recently
+        now = time.monotonic()
+        with self._lock:
+            warm = now - self._last_used < WARM_WINDOW_S
+            self._last_used = now
+        return warm
+
+
+_BACKENDS = {"bedrock": BedrockBackend, "openai": OpenAICompatBackend}
+
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def get_backend(name: str = None) -> ModelBackend:
+    """Shared backend instance by name (default MODEL_BACKEND), created on first use."""
+    name = name or MODEL_BACKEND
+    with _instances_lock:
+        if name not in _instances:
+            if name not in _BACKENDS:
+                raise ValueError(f"unknown model backend '{name}' (expected one of {', '.join(_BACKENDS)})")
+            _instances[name] = _BACKENDS[name]()
+        return _instances[name]
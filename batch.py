@@ -0,0 +1,283 @@
+"""
+Headless batch mode: run a directory or manifest of images and text files
+through the same encode / ask_claude / ask_claude_text pipeline as the overlay.
+
+    python batch.py ./problems --out answers.jsonl --mode Interview
+    python batch.py manifest.jsonl --out answers.jsonl --concurrency 8 --rate 3
+
+A manifest is a JSONL file with one item per line:
+    {"id": "two-sum", "path": "two_sum.png", "mode": "Interview"}
+    {"id": "q2", "text": "Reverse a linked list", "mode": "Debug"}
+IDs must be unique. Without one, an item is identified by its path (or a hash
+of its text) plus its mode, so editing the manifest does not shift IDs.
+
+Results are appended to --out as each item finishes. Re-running with the same
+--out skips items already answered, so an interrupted run just resumes.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from config import (
+    PROMPTS, PROMPT_NAMES, TEXT_PROMPTS, MODE_LIMITS,
+    BATCH_CONCURRENCY, BATCH_RATE, BATCH_BURST, BATCH_MAX_ATTEMPTS,
+)
+import bedrock
+import metrics
+from bedrock import ask_claude, ask_claude_text, BedrockThrottled
+from capture import load_image
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".webp", ".bmp", ".gif"}
+TEXT_EXTENSIONS = {".txt", ".md", ".py", ".js", ".ts", ".java", ".c", ".cpp", ".go", ".rs", ".log"}
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket limiting request starts per second.
+
+    The refill rate backs off multiplicatively when Bedrock throttles and creeps
+    back up additively on success (AIMD), so a run settles just under the quota.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then take it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def throttled(self):
+        with self._lock:
+            self.rate = max(self.max_rate / 16, self.rate / 2)
+            self._tokens = 0.0
+
+    def succeeded(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+def _item_kind(path: str) -> str | None:
+    ext = os.path.splitext(path)[1].lower()
+    if ext in IMAGE_EXTENSIONS:
+        return "image"
+    if ext in TEXT_EXTENSIONS:
+        return "text"
+    return None
+
+
+def load_items(source: str, default_mode: str) -> list[dict]:
+    """
+    Returns [{"id", "kind", "path" | "text", "mode"}] from a directory
+    (sorted, non-recursive) or a JSONL manifest.
+    """
+    items = []
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            path = os.path.join(source, name)
+            kind = _item_kind(path)
+            if kind and os.path.isfile(path):
+                items.append({"id": name, "kind": kind, "path": path, "mode": default_mode})
+        return items
+
+    base = os.path.dirname(os.path.abspath(source))
+    seen = {}  # id -> line number
+    with open(source) as f:
+        for lineno, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{source}:{lineno}: invalid JSON ({e})") from e
+            if not isinstance(entry, dict):
+                raise ValueError(f"{source}:{lineno}: entry must be a JSON object")
+            mode = entry.get("mode", default_mode)
+            if not isinstance(mode, str) or mode not in PROMPTS:
+                raise ValueError(f"{source}:{lineno}: unknown mode '{mode}' (expected one of {PROMPT_NAMES})")
+            if "text" in entry:
+                if not isinstance(entry["text"], str):
+                    raise ValueError(f"{source}:{lineno}: 'text' must be a string")
+                item = {"kind": "text", "text": entry["text"]}
+            elif "path" not in entry:
+                raise ValueError(f"{source}:{lineno}: entry needs a 'text' or 'path' field")
+            elif not isinstance(entry["path"], str):
+                raise ValueError(f"{source}:{lineno}: 'path' must be a string")
+            else:
+                path = os.path.join(base, entry["path"])
+                kind = _item_kind(path)
+                if kind is None:
+                    raise ValueError(f"{source}:{lineno}: unsupported file type '{entry['path']}'")
+                item = {"kind": kind, "path": path}
+            if "id" in entry:
+                item_id = str(entry["id"])
+            elif "path" in item:
+                item_id = f"{entry['path']}:{mode}"
+            else:
+                item_id = f"text-{hashlib.sha1(item['text'].encode()).hexdigest()[:12]}:{mode}"
+            if item_id in seen:
+                raise ValueError(f"{source}:{lineno}: duplicate id '{item_id}' (first on line {seen[item_id]})")
+            seen[item_id] = lineno
+            item["id"] = item_id
+            item["mode"] = mode
+            items.append(item)
+    return items
+
+
+def completed_ids(out_path: str) -> set:
+    """IDs already answered successfully in a previous run's output."""
+    done = set()
+    if not os.path.exists(out_path):
+        return done
+    with open(out_path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # partial last line from an interrupted run
+            if record.get("status") == "ok":
+                done.add(record["id"])
+    return done
+
+
+def run_item(item: dict, bucket: TokenBucket, max_attempts: int) -> dict:
+    """
+    Encode and ask one item, retrying throttled requests with backoff.
+    Other Bedrock errors fail the item straight away (botocore already retried them).
+    """
+    mode = item["mode"]
+    if item["kind"] == "image":
+        image_b64 = load_image(item["path"])
+
+        def ask(on_token):
+            return ask_claude(image_b64, on_token, prompt=PROMPTS[mode], limits=MODE_LIMITS[mode])
+    else:
+        if "text" in item:
+            text = item["text"]
+        else:
+            with open(item["path"], encoding="utf-8", errors="replace") as f:
+                text = f.read()
+
+        def ask(on_token):
+            return ask_claude_text(text, on_token, prompt=TEXT_PROMPTS[mode], limits=MODE_LIMITS[mode])
+
+    record = {"id": item["id"], "kind": item["kind"], "mode": mode}
+    if "path" in item:
+        record["path"] = item["path"]
+
+    for attempt in range(1, max_attempts + 1):
+        bucket.acquire()
+        parts = []
+        started = time.perf_counter()
+        try:
+            result = ask(parts.append)
+        except BedrockThrottled as e:
+            bucket.throttled()
+            error = e
+        except RuntimeError as e:
+            error = e
+            break
+        else:
+            bucket.succeeded()
+            latency_ms = (time.perf_counter() - started) * 1000
+            metrics.observe("batch.item_ms", latency_ms)
+            record.update({
+                "status": "ok",
+                "answer": "".join(parts),
+                "stop_reason": result["stop_reason"],
+                "usage": result["usage"],
+                "latency_ms": round(latency_ms),
+                "attempts": attempt,
+            })
+            return record
+        if attempt < max_attempts:
+            time.sleep(min(30.0, 2 ** attempt))
+
+    metrics.incr("batch.failed")
+    record.update({"status": "error", "error": str(error), "attempts": attempt})
+    return record
+
+
+def run_batch(items: list[dict], out_path: str, concurrency: int, rate: float, burst: int,
+              max_attempts: int) -> tuple[int, int]:
+    """Runs items on a bounded pool, appending each result to out_path. Returns (ok, failed)."""
+    bucket = TokenBucket(rate, burst)
+    bedrock.set_max_concurrent_streams(concurrency)
+    bedrock.prewarm(concurrency)
+    write_lock = threading.Lock()
+    ok = failed = 0
+    started = time.perf_counter()
+
+    with open(out_path, "a") as out, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {pool.submit(run_item, item, bucket, max_attempts): item for item in items}
+        for n, future in enumerate(as_completed(futures), 1):
+            item = futures[future]
+            try:
+                record = future.result()
+            except Exception as e:  # unreadable file, bad image, ...
+                record = {"id": item["id"], "kind": item["kind"], "mode": item["mode"],
+                          "status": "error", "error": str(e), "attempts": 0}
+            with write_lock:
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+            if record["status"] == "ok":
+                ok += 1
+                detail = f"{record['latency_ms']} ms"
+            else:
+                failed += 1
+                detail = record["error"]
+            elapsed = time.perf_counter() - started
+            print(f"[{n}/{len(items)}] {record['status']:5} {item['id']}  {detail}  "
+                  f"({n / elapsed:.2f} items/s, rate {bucket.rate:.2f}/s)", file=sys.stderr)
+    return ok, failed
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run images/text files through Claude in batch.")
+    parser.add_argument("source", help="directory of images/text files, or a JSONL manifest")
+    parser.add_argument("--out", required=True, help="JSONL output file (appended; enables resume)")
+    parser.add_argument("--mode", default=PROMPT_NAMES[0], choices=PROMPT_NAMES,
+                        help="prompt mode for items without one")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY)
+    parser.add_argument("--rate", type=float, default=BATCH_RATE, help="max requests started per second")
+    parser.add_argument("--burst", type=int, default=BATCH_BURST)
+    parser.add_argument("--max-attempts", type=int, default=BATCH_MAX_ATTEMPTS)
+    args = parser.parse_args(argv)
+
+    try:
+        items = load_items(args.source, args.mode)
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 2
+    done = completed_ids(args.out)
+    pending = [item for item in items if item["id"] not in done]
+    print(f"📦 {len(items)} items, {len(items) - len(pending)} already done, {len(pending)} to run",
+          file=sys.stderr)
+    if not pending:
+        return 0
+
+    ok, failed = run_batch(pending, args.out, args.concurrency, args.rate, args.burst, args.max_attempts)
+    print(f"✅ {ok} ok  ❌ {failed} failed  →  {args.out}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,122 +1,364 @@
 import base64
 import logging
-import boto3
-from botocore.config import Config
-from botocore.exceptions import ClientError, BotoCoreError
-from config import AWS_REGION, AWS_PROFILE, BEDROCK_MODEL, PROMPT, TEXT_PROMPT, FOLLOWUP_PROMPT
+import os
+import threading
+import time
+import metrics
+from backends import BedrockThrottled, get_backend
+from config import (
+    PROMPT, TEXT_PROMPT, FOLLOWUP_PROMPT, STREAM_MAX_RESUMES,
+    MODE_LIMITS, FOLLOWUP_LIMITS, RESPONSE_SECTIONS, MAX_CONCURRENT_STREAMS,
+    DRAFT_PROMPT, DRAFT_LIMITS,
+)
 
 logger = logging.getLogger(__name__)
 
-_KNOWN_PREFIXES = ("anthropic.claude", "us.anthropic.claude")
-if not BEDROCK_MODEL.startswith(_KNOWN_PREFIXES):
-    logger.warning(
-        "BEDROCK_MODEL '%s' does not start with a known Claude prefix (%s). "
-        "Verify the model ID is correct.",
-        BEDROCK_MODEL,
-        ", ".join(_KNOWN_PREFIXES),
-    )
+# Caps concurrent streams across full answers and drafts
+_stream_slots = threading.BoundedSemaphore(MAX_CONCURRENT_STREAMS)
+
+
+def set_max_concurrent_streams(limit: int):
+    """Resize the stream cap (e.g. for batch.py). Call before any streams start."""
+    global _stream_slots
+    _stream_slots = threading.BoundedSemaphore(limit)
+    get_backend().ensure_pool(limit + 2)
+
 
-retry_config = Config(retries={"max_attempts": 3, "mode": "adaptive"})
-session = boto3.Session(profile_name=AWS_PROFILE, region_name=AWS_REGION)
-client = session.client("bedrock-runtime", config=retry_config)
+def prewarm(connections: int):
+    """Open up to connections backend connections now (e.g. before a batch run)."""
+    get_backend().prewarm(connections)
+
+
+def start_keepwarm():
+    """Pre-warm the model backend's connections and keep them warm in the background."""
+    get_backend().start_keepwarm()
 
 
 def test_connection() -> bool:
     """
-    Test Bedrock connection by making a minimal API call.
+    Test the configured model backend (MODEL_BACKEND) with a minimal request.
     Returns True if successful, raises exception on failure.
     """
-    try:
-        response = client.converse(
-            modelId=BEDROCK_MODEL,
-            messages=[{"role": "user", "content": [{"text": "hi"}]}],
-            inferenceConfig={"maxTokens": 1},
-        )
-        return True
-    except ClientError as e:
-        error_code = e.response["Error"]["Code"]
-        raise RuntimeError(f"Bedrock connection failed ({error_code}): {e}") from e
-    except BotoCoreError as e:
-        raise RuntimeError(f"AWS SDK error: {e}") from e
-
-
-def _stream(system: list, messages: list, on_token):
-    """Send messages to Bedrock and call on_token for each streamed text chunk."""
-    try:
-        response = client.converse_stream(
-            modelId=BEDROCK_MODEL,
-            system=system,
-            messages=messages,
-            inferenceConfig={"maxTokens": 2048},
-        )
-
-        for event in response["stream"]:
-            if "contentBlockDelta" in event:
-                delta = event["contentBlockDelta"]["delta"]
-                if "text" in delta:
-                    on_token(delta["text"])
-
-    except ClientError as e:
-        error_code = e.response["Error"]["Code"]
-        logger.error("Bedrock API error [%s]: %s", error_code, e)
-        raise RuntimeError(f"Bedrock API error ({error_code}): {e}") from e
-    except BotoCoreError as e:
-        logger.error("AWS SDK error: %s", e)
-        raise RuntimeError(f"AWS SDK error: {e}") from e
-
-
-def ask_claude(image_b64: str, on_token, prompt: str = None):
-    """
-    Sends base64 screenshot to Claude via AWS Bedrock and streams the response.
+    get_backend().health()
+    return True
+
+
+class _StreamInterrupted(Exception):
+    """Raised when a model event stream ends before messageStop."""
+
+
+def _estimate_tokens(text: str) -> int:
+    """Rough output-token estimate (~4 chars/token) for text we did not regenerate."""
+    return max(1, len(text) // 4) if text else 0
+
+
+def _is_resumable(backend, error: Exception) -> bool:
+    if not backend.supports_prefill:
+        return False  # a continuation would restart the answer, not extend it
+    return isinstance(error, _StreamInterrupted) or backend.is_resumable(error)
+
+
+def sections_complete(text: str) -> bool:
+    """
+    True once every RESPONSE_SECTIONS heading has appeared in order and the
+    code block under the last one has been closed.
+    """
+    pos = 0
+    for heading in RESPONSE_SECTIONS:
+        pos = text.find(heading, pos)
+        if pos < 0:
+            return False
+    return text.count("```", pos) >= 2
+
+
+def _consume(stream, emit, should_stop=None) -> tuple[str, dict]:
+    """
+    Drain a Converse-style event stream, passing each text delta to emit.
+    Returns (stop_reason, usage). should_stop() is polled after each delta;
+    a non-empty return ends the stream early with that string as the reason.
+    Raises _StreamInterrupted if the stream ends without a messageStop event.
+    """
+    stop_reason = None
+    usage = {}
+    for event in stream:
+        if "contentBlockDelta" in event:
+            delta = event["contentBlockDelta"]["delta"]
+            if "text" in delta:
+                emit(delta["text"])
+                early = should_stop() if should_stop else None
+                if early:
+                    if hasattr(stream, "close"):
+                        stream.close()
+                    return early, usage
+        elif "messageStop" in event:
+            stop_reason = event["messageStop"].get("stopReason")
+        elif "metadata" in event:
+            usage = event["metadata"].get("usage", {})
+    if stop_reason is None:
+        raise _StreamInterrupted("event stream ended before messageStop")
+    return stop_reason, usage
+
+
+def _stream(system: list, messages: list, on_token, limits: dict = None, stop_event=None,
+            model_id: str = None, label: str = "full") -> dict:
+    """
+    Send messages to the model backend and call on_token for each streamed text chunk.
+
+    limits is a MODE_LIMITS entry (output budget, stop sequences, section
+    early-stop). Setting stop_event (threading.Event) ends the stream early.
+    model_id defaults to the backend's model; label names the stream in metrics
+    (stream.<backend>.<label>.first_token_ms / total_ms), so backends can be
+    compared by switching MODEL_BACKEND. At most MAX_CONCURRENT_STREAMS
+    streams run at once; extra callers wait for a slot.
+
+    If the event stream breaks partway through, a continuation request is sent
+    with the partial reply prefilled as an assistant turn, so generation picks
+    up where it stopped and on_token just keeps receiving text. Backends
+    without supports_prefill are not resumed; the error is raised instead.
+
+    Returns {"stop_reason", "usage", "resumes", "tokens_saved"}. stop_reason is
+    the model's in Bedrock terms (end_turn, max_tokens, stop_sequence) or, for client-side stops,
+    "sections_complete" / "user_stop".
+    """
+    backend = get_backend()
+    with _stream_slots:
+        return _stream_unbounded(backend, system, messages, on_token, limits or MODE_LIMITS["Interview"],
+                                 stop_event, model_id or backend.default_model, f"{backend.name}.{label}")
+
+
+def _stream_unbounded(backend, system, messages, on_token, limits, stop_event, model_id, label) -> dict:
+    """Body of _stream(), run while holding a stream slot."""
+    started = time.perf_counter()
+    warmth = "warm" if backend.mark_used() else "cold"
+    first_token = True
+    parts = []
+    resumes = 0
+    tokens_saved = 0
+    broke_at = None   # perf_counter() when the last stream broke
+    shown_ws = ""     # trailing whitespace shown before the break but not prefilled
+    check_sections = False
+
+    def should_stop():
+        nonlocal check_sections
+        if stop_event is not None and stop_event.is_set():
+            return "user_stop"
+        # Only rescan when a backtick arrives — a closing fence is the last thing we wait for
+        if check_sections:
+            check_sections = False
+            if sections_complete("".join(parts)):
+                return "sections_complete"
+        return None
+
+    def emit(token: str):
+        nonlocal broke_at, shown_ws, check_sections, first_token
+        if shown_ws:
+            # Skip only the part of the continuation's whitespace that is already on screen
+            shared = len(os.path.commonprefix([token, shown_ws]))
+            shown_ws = shown_ws[shared:] if shared == len(token) else ""
+            token = token[shared:]
+            if not token:
+                return
+        if first_token:
+            first_token_ms = (time.perf_counter() - started) * 1000
+            metrics.observe(f"stream.{label}.first_token_ms", first_token_ms)
+            metrics.observe(f"stream.{label}.first_token_ms.{warmth}", first_token_ms)
+            first_token = False
+        if broke_at is not None:
+            resume_ms = (time.perf_counter() - broke_at) * 1000
+            metrics.observe("stream.resume_latency_ms", resume_ms)
+            logger.info("Stream resumed after %.0f ms", resume_ms)
+            broke_at = None
+        parts.append(token)
+        check_sections = limits.get("stop_on_sections", False) and "`" in token
+        on_token(token)
+
+    while True:
+        partial = "".join(parts)
+        prefill = partial.rstrip()  # Bedrock rejects prefill ending in whitespace
+        request_messages = messages
+        if prefill:
+            request_messages = messages + [{"role": "assistant", "content": [{"text": prefill}]}]
+        shown_ws = partial[len(prefill):]
+
+        inference_config = {
+            # A continuation only needs what is left of the budget
+            "maxTokens": max(1, limits["max_tokens"] - _estimate_tokens(prefill)),
+        }
+        if limits.get("stop_sequences"):
+            inference_config["stopSequences"] = limits["stop_sequences"]
+
+        # A failing request is already retried by the backend's client (botocore);
+        # only errors raised while reading the event stream are resumed here.
+        try:
+            events = backend.open_stream(model_id, system, request_messages, inference_config)
+        except Exception as e:
+            _raise_backend_error(backend, e)
+
+        try:
+            stop_reason, usage = _consume(events, emit, should_stop)
+        except Exception as e:
+            if not _is_resumable(backend, e) or resumes >= STREAM_MAX_RESUMES:
+                _raise_backend_error(backend, e)
+            resumes += 1
+            partial = "".join(parts)
+            saved = _estimate_tokens(partial)
+            tokens_saved += saved
+            broke_at = time.perf_counter()
+            metrics.incr("stream.resumes")
+            metrics.incr("stream.resume_tokens_saved", saved)
+            logger.warning(
+                "Model stream broke after %d chars (%s); resuming (%d/%d)",
+                len(partial), e, resumes, STREAM_MAX_RESUMES,
+            )
+            continue
+
+        metrics.incr(f"stream.stop.{stop_reason}")
+        metrics.observe(f"stream.{label}.total_ms", (time.perf_counter() - started) * 1000)
+        return {
+            "stop_reason": stop_reason,
+            "usage": usage,
+            "resumes": resumes,
+            "tokens_saved": tokens_saved,
+        }
+
+
+def _raise_backend_error(backend, e: Exception):
+    """Log and re-raise a backend error as RuntimeError (BedrockThrottled when throttled)."""
+    if isinstance(e, _StreamInterrupted):
+        logger.error("%s stream interrupted: %s", backend.name, e)
+        raise RuntimeError(f"Model stream interrupted ({backend.name}): {e}") from e
+    translated = backend.translate_error(e)
+    if isinstance(translated, BedrockThrottled):
+        metrics.incr("stream.throttled")
+    if translated is e:
+        raise e
+    logger.error("%s", translated)
+    raise translated from e
+
+
+class _AnyEvent:
+    """Looks like a threading.Event to _stream(); set when any of the given events is."""
+
+    def __init__(self, *events):
+        self._events = [event for event in events if event is not None]
+
+    def is_set(self) -> bool:
+        return any(event.is_set() for event in self._events)
+
+
+def _start_draft(messages: list, draft, stop_event=None) -> threading.Thread:
+    """
+    Streams a draft-model answer (DRAFT_MODEL, or LOCAL_DRAFT_MODEL for the
+    local backend) for the opening sections on a background thread.
+
+    draft receives tokens via draft.on_draft(token), and draft.draft_done()
+    once the stream ends for any reason; setting draft.cancelled (a
+    threading.Event) stops it early. Draft failures are logged and dropped —
+    the full answer is unaffected.
+    """
+    def _run():
+        try:
+            _stream(
+                system=[{"text": DRAFT_PROMPT}],
+                messages=messages,
+                on_token=draft.on_draft,
+                limits=DRAFT_LIMITS,
+                stop_event=_AnyEvent(stop_event, draft.cancelled),
+                model_id=get_backend().draft_model,
+                label="draft",
+            )
+        except Exception as e:
+            metrics.incr("stream.draft_errors")
+            logger.warning("Draft stream failed: %s", e)
+        finally:
+            draft.draft_done()
+
+    thread = threading.Thread(target=_run, daemon=True)
+    thread.start()
+    return thread
+
+
+def ask_claude(image_b64: str, on_token, prompt: str = None, limits: dict = None, stop_event=None,
+               draft=None):
+    """
+    Sends base64 screenshot to Claude via the model backend and streams the response.
 
     Args:
         image_b64: base64-encoded PNG string from capture.py
         on_token: callback function called with each streamed token (str)
         prompt: optional system prompt (defaults to PROMPT from config)
+        limits: optional MODE_LIMITS entry (defaults to Interview)
+        stop_event: optional threading.Event that ends the stream when set
+        draft: if given, the draft model streams a fast draft of the opening
+            sections to it concurrently (see _start_draft)
+
+    Returns the stream summary dict from _stream().
     """
     image_bytes = base64.standard_b64decode(image_b64)
-    _stream(
+    messages = [{
+        "role": "user",
+        "content": [
+            {"image": {"format": "png", "source": {"bytes": image_bytes}}},
+            {"text": "Solve this problem."},
+        ],
+    }]
+    if draft is not None:
+        _start_draft(messages, draft, stop_event)
+    return _stream(
         system=[{"text": prompt or PROMPT}],
-        messages=[{
-            "role": "user",
-            "content": [
-                {"image": {"format": "png", "source": {"bytes": image_bytes}}},
-                {"text": "Solve this problem."},
-            ],
-        }],
+        messages=messages,
         on_token=on_token,
+        limits=limits,
+        stop_event=stop_event,
     )
 
 
-def ask_claude_followup(conversation: list, on_token):
+def ask_claude_followup(conversation: list, on_token, stop_event=None):
     """
-    Sends multi-turn conversation to Claude via AWS Bedrock and streams the response.
+    Sends multi-turn conversation to Claude via the model backend and streams the response.
 
     Args:
         conversation: list of Bedrock message dicts (role + content)
         on_token: callback function called with each streamed token (str)
+        stop_event: optional threading.Event that ends the stream when set
+
+    Returns the stream summary dict from _stream().
     """
-    _stream(
+    return _stream(
         system=[{"text": FOLLOWUP_PROMPT}],
         messages=conversation,
         on_token=on_token,
+        limits=FOLLOWUP_LIMITS,
+        stop_event=stop_event,
     )
 
 
-def ask_claude_text(text: str, on_token, prompt: str = None):
+def ask_claude_text(text: str, on_token, prompt: str = None, limits: dict = None, stop_event=None,
+                    draft=None):
     """
-    Sends plain text to Claude via AWS Bedrock and streams the response.
+    Sends plain text to Claude via the model backend and streams the response.
 
     Args:
         text: the clipboard text to analyze
         on_token: callback function called with each streamed token (str)
         prompt: optional system prompt (defaults to TEXT_PROMPT from config)
+        limits: optional MODE_LIMITS entry (defaults to Interview)
+        stop_event: optional threading.Event that ends the stream when set
+        draft: if given, the draft model streams a fast draft of the opening
+            sections to it concurrently (see _start_draft)
+
+    Returns the stream summary dict from _stream().
     """
-    _stream(
+    messages = [{
+        "role": "user",
+        "content": [{"text": text}],
+    }]
+    if draft is not None:
+        _start_draft(messages, draft, stop_event)
+    return _stream(
         system=[{"text": prompt or TEXT_PROMPT}],
-        messages=[{
-            "role": "user",
-            "content": [{"text": text}],
-        }],
+        messages=messages,
         on_token=on_token,
+        limits=limits,
+        stop_event=stop_event,
     )
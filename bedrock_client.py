@@ -0,0 +1,167 @@
+"""
+Bedrock runtime client manager: keeps the connection pool sized for the
+number of concurrent streams, warm, and holding fresh credentials.
+
+- prewarm() opens several pooled connections in parallel (TLS + SigV4) before
+  the first real request.
+- The keep-warm thread pings the endpoint when the pool has been idle for
+  KEEPWARM_INTERVAL_S. Pings are capped at KEEPWARM_MAX_PER_HOUR and stop
+  after KEEPWARM_IDLE_STOP_S without real requests.
+- Each keep-warm tick also reads the credentials, which makes botocore refresh
+  refreshable (SSO / assume-role / credential_process) credentials ahead of
+  expiry instead of on the hot path. Static profile credentials (e.g. written by
+  a SAML tool) are reloaded by rebuilding the session when Bedrock reports
+  them expired, whether on a ping or a real request.
+
+A keep-warm ping is a converse() call with a deliberately invalid model ID.
+It is authenticated and rejected with ValidationException, so it completes
+TLS and signing on a pooled connection without generating tokens.
+"""
+import logging
+import threading
+import time
+from collections import deque
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
+
+import metrics
+from config import (
+    KEEPWARM_ENABLED, KEEPWARM_INTERVAL_S, KEEPWARM_MAX_PER_HOUR, KEEPWARM_IDLE_STOP_S,
+    PREWARM_CONNECTIONS, WARM_WINDOW_S,
+)
+
+logger = logging.getLogger(__name__)
+
+_PING_MODEL_ID = "keepwarm-ping.invalid"
+_EXPIRED_CREDENTIAL_CODES = {"expiredtokenexception", "expiredtoken", "unrecognizedclientexception"}
+
+
+def is_expired_credentials(error: Exception) -> bool:
+    return isinstance(error, ClientError) and error.response["Error"]["Code"].lower() in _EXPIRED_CREDENTIAL_CODES
+
+
+class ClientManager:
+    """Owns the bedrock-runtime client; thread-safe."""
+
+    def __init__(self, profile: str, region: str, pool_connections: int):
+        self._profile = profile
+        self._region = region
+        self._pool_connections = pool_connections
+        self._lock = threading.Lock()
+        self._last_used = 0.0      # monotonic time of the last request or ping
+        self._last_request = time.monotonic()
+        self._pings = deque()      # ping timestamps within the last hour
+        self._keepwarm = None
+        self._session, self._client = self._build()
+
+    def _build(self):
+        config = Config(
+            retries={"max_attempts": 3, "mode": "adaptive"},
+            max_pool_connections=self._pool_connections,
+            tcp_keepalive=True,
+        )
+        session = boto3.Session(profile_name=self._profile, region_name=self._region)
+        return session, session.client("bedrock-runtime", config=config)
+
+    @property
+    def client(self):
+        return self._client
+
+    def rebuild(self):
+        """Recreates session + client (re-reads profile credentials). Pool starts cold."""
+        session, client = self._build()
+        with self._lock:
+            self._session, self._client = session, client
+            self._last_used = 0.0
+        metrics.incr("client.rebuilds")
+        logger.info("Bedrock client rebuilt (pool size %d)", self._pool_connections)
+
+    def ensure_pool(self, connections: int):
+        """Grows max_pool_connections to at least connections (rebuilds the client)."""
+        if connections > self._pool_connections:
+            self._pool_connections = connections
+            self.rebuild()
+
+    def mark_used(self) -> bool:
+        """Records a real request; returns True if the pool was recently used (warm)."""
+        now = time.monotonic()
+        with self._lock:
+            warm = now - self._last_used < WARM_WINDOW_S
+            self._last_used = self._last_request = now
+        return warm
+
+    # ── Warming ───────────────────────────────────────────────────────────
+
+    def ping(self) -> bool:
+        """One authenticated round trip on a pooled connection. Returns True on success."""
+        started = time.perf_counter()
+        try:
+            self._client.converse(
+                modelId=_PING_MODEL_ID,
+                messages=[{"role": "user", "content": [{"text": "."}]}],
+            )
+        except ClientError as e:
+            if is_expired_credentials(e):
+                logger.warning("Bedrock credentials expired; reloading profile")
+                self.rebuild()
+                return False
+            # ValidationException (or similar) is the expected answer
+        except BotoCoreError as e:
+            logger.warning("Keep-warm ping failed: %s", e)
+            return False
+        with self._lock:
+            self._last_used = time.monotonic()
+        metrics.observe("client.ping_ms", (time.perf_counter() - started) * 1000)
+        return True
+
+    def prewarm(self, connections: int = PREWARM_CONNECTIONS):
+        """Opens up to connections pooled connections in parallel and waits for them."""
+        connections = min(connections, self._pool_connections)
+        started = time.perf_counter()
+        threads = [threading.Thread(target=self.ping, daemon=True) for _ in range(connections)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        prewarm_ms = (time.perf_counter() - started) * 1000
+        metrics.observe("client.prewarm_ms", prewarm_ms)
+        logger.info("Pre-warmed %d Bedrock connections in %.0f ms", connections, prewarm_ms)
+
+    def refresh_credentials(self):
+        """Lets botocore refresh refreshable credentials now if they are near expiry."""
+        credentials = self._session.get_credentials()
+        if credentials is not None:
+            credentials.get_frozen_credentials()
+
+    def start_keepwarm(self):
+        """Pre-warms the pool, then keeps it warm in the background (if KEEPWARM_ENABLED)."""
+        if self._keepwarm is not None:
+            return
+        self._keepwarm = threading.Thread(target=self._keepwarm_loop, name="bedrock-keepwarm", daemon=True)
+        self._keepwarm.start()
+
+    def _keepwarm_loop(self):
+        self.prewarm()
+        if not KEEPWARM_ENABLED:
+            return
+        while True:
+            time.sleep(KEEPWARM_INTERVAL_S / 2)
+            try:
+                self.refresh_credentials()
+            except BotoCoreError as e:
+                logger.warning("Credential refresh failed: %s", e)
+            now = time.monotonic()
+            with self._lock:
+                idle = now - self._last_used
+                abandoned = now - self._last_request > KEEPWARM_IDLE_STOP_S
+                while self._pings and now - self._pings[0] > 3600:
+                    self._pings.popleft()
+                over_budget = len(self._pings) >= KEEPWARM_MAX_PER_HOUR
+            if idle < KEEPWARM_INTERVAL_S or abandoned or over_budget:
+                continue
+            with self._lock:
+                self._pings.append(now)
+            metrics.incr("client.keepwarm_pings")
+            self.ping()
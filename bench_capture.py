@@ -0,0 +1,74 @@
+"""
+Grab-latency and throughput benchmark for the capture backends.
+
+    python bench_capture.py                  # all available backends, main monitor
+    python bench_capture.py -n 200 --encode  # also time PNG encode
+    xvfb-run -s "-screen 0 1920x1080x24" python bench_capture.py   # headless Linux
+
+Backends that cannot start here (e.g. XShm without an X display) are skipped.
+"""
+import argparse
+import statistics
+import time
+
+from capture import encode_image
+from capture_backends import MssBackend, XShmBackend
+
+
+def _bench(backend, region: dict, iterations: int, encode: bool) -> dict:
+    backend.grab(region)  # warm-up: connection / segment allocation
+    grab_ms, encode_ms = [], []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        img = backend.grab(region)
+        grab_ms.append((time.perf_counter() - t0) * 1000)
+        if encode:
+            t0 = time.perf_counter()
+            encode_image(img)
+            encode_ms.append((time.perf_counter() - t0) * 1000)
+    elapsed = time.perf_counter() - started
+
+    grab_ms.sort()
+    frame_mb = region["width"] * region["height"] * 4 / 1e6
+    result = {
+        "p50": statistics.median(grab_ms),
+        "p95": grab_ms[min(len(grab_ms) - 1, int(len(grab_ms) * 0.95))],
+        "mean": statistics.fmean(grab_ms),
+        "fps": iterations / elapsed,
+        "mb_s": frame_mb * iterations / (sum(grab_ms) / 1000),
+    }
+    if encode:
+        result["encode_p50"] = statistics.median(encode_ms)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark screen-grab backends.")
+    parser.add_argument("-n", "--iterations", type=int, default=100)
+    parser.add_argument("--encode", action="store_true", help="also time PNG encode per frame")
+    args = parser.parse_args(argv)
+
+    region = MssBackend().main_monitor()
+    print(f"Region {region['width']}x{region['height']}, {args.iterations} grabs per backend\n")
+    print(f"{'backend':8} {'p50 ms':>8} {'p95 ms':>8} {'mean ms':>8} {'fps':>8} {'MB/s':>8}"
+          + (f" {'enc p50':>8}" if args.encode else ""))
+
+    for backend_cls in (MssBackend, XShmBackend):
+        try:
+            backend = backend_cls()
+        except (RuntimeError, OSError) as e:
+            print(f"{backend_cls.name:8} skipped: {e}")
+            continue
+        try:
+            r = _bench(backend, region, args.iterations, args.encode)
+        finally:
+            backend.close()
+        line = f"{backend.name:8} {r['p50']:8.2f} {r['p95']:8.2f} {r['mean']:8.2f} {r['fps']:8.1f} {r['mb_s']:8.0f}"
+        if args.encode:
+            line += f" {r['encode_p50']:8.2f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,51 @@
-import mss
 import io
 import base64
+import logging
 import tkinter as tk
 from PIL import Image
+from capture_backends import MssBackend, get_backend
+
+logger = logging.getLogger(__name__)
+
+
+def grab(region: dict = None) -> Image.Image:
+    """
+    Grabs region (default: main monitor) with the configured backend,
+    falling back to mss if the fast backend fails on this grab.
+    """
+    backend = get_backend()
+    if region is None:
+        region = backend.main_monitor()
+    try:
+        return backend.grab(region)
+    except RuntimeError as e:
+        if isinstance(backend, MssBackend):
+            raise
+        logger.warning("%s grab failed (%s); using mss", backend.name, e)
+        return MssBackend().grab(region)
+
+
+def encode_png(img: Image.Image) -> bytes:
+    """Returns img as raw PNG bytes."""
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def encode_image(img: Image.Image) -> str:
+    """Returns img as a base64-encoded PNG string ready for Claude Vision API."""
+    return base64.standard_b64encode(encode_png(img)).decode()
+
+
+def load_image(path: str) -> str:
+    """
+    Loads an image file (any format Pillow reads) for the batch pipeline.
+    Returns base64-encoded PNG string, same as capture_screen().
+    """
+    with Image.open(path) as img:
+        if img.mode not in ("RGB", "RGBA", "L"):
+            img = img.convert("RGB")
+        return encode_image(img)
 
 
 def capture_screen() -> str:
@@ -10,14 +53,7 @@ def capture_screen() -> str:
     Captures full screen (main monitor).
     Returns base64-encoded PNG string ready for Claude Vision API.
     """
-    with mss.mss() as sct:
-        # monitors[0] = all monitors combined
-        # monitors[1] = main monitor only
-        screenshot = sct.grab(sct.monitors[1])
-        img = Image.frombytes("RGB", screenshot.size, screenshot.bgra, "raw", "BGRX")
-        buf = io.BytesIO()
-        img.save(buf, format="PNG")
-        return base64.standard_b64encode(buf.getvalue()).decode()
+    return encode_image(grab())
 
 
 def capture_selection(root: tk.Tk) -> str | None:
@@ -25,6 +61,17 @@ def capture_selection(root: tk.Tk) -> str | None:
     Opens a fullscreen transparent overlay for user to drag-select a region.
     Returns base64-encoded PNG of the selected region, or None if cancelled.
     """
+    region = select_region(root)
+    if region is None:
+        return None
+    return encode_image(grab(region))
+
+
+def select_region(root: tk.Tk) -> dict | None:
+    """
+    Opens a fullscreen transparent overlay for user to drag-select a region.
+    Returns the region dict (left, top, width, height), or None if cancelled.
+    """
     selection = {"x1": 0, "y1": 0, "x2": 0, "y2": 0, "done": False, "cancelled": False}
     
     # Create fullscreen selection window
@@ -92,11 +139,4 @@ def capture_selection(root: tk.Tk) -> str | None:
     if width < 10 or height < 10:
         return None  # Too small
     
-    # Capture the selected region
-    with mss.mss() as sct:
-        region = {"left": x1, "top": y1, "width": width, "height": height}
-        screenshot = sct.grab(region)
-        img = Image.frombytes("RGB", screenshot.size, screenshot.bgra, "raw", "BGRX")
-        buf = io.BytesIO()
-        img.save(buf, format="PNG")
-        return base64.standard_b64encode(buf.getvalue()).decode()
+    return {"left": x1, "top": y1, "width": width, "height": height}
@@ -0,0 +1,333 @@
+"""
+Pluggable screen-grab backends for capture.py.
+
+    MssBackend   — mss's generic grab (all platforms)
+    XShmBackend  — Linux/X11 MIT-SHM: the X server writes straight into a
+                   reusable shared-memory segment, and Pillow decodes from a
+                   view of it without intermediate bytes copies
+
+get_backend() picks one per CAPTURE_BACKEND and falls back to mss if XShm is
+unavailable (no X display, remote display, no MIT-SHM, non-32bpp visual).
+XShm is opt-in: its ctypes bindings have not been exercised against a real X
+server yet, and a mistake there crashes the process rather than raising, so
+nothing can fall back from it.
+
+Xlib's error handler is process-global. XShmBackend installs its own only
+around its calls (from capture worker / sampler threads while Tk's main loop
+runs), and forwards errors from other connections — i.e. Tk's — to the
+handler it replaced, so Tk's X errors are neither swallowed nor mistaken for
+grab failures. Tk must not call XSetErrorHandler itself in that window (it
+only does at startup).
+"""
+import contextlib
+import ctypes
+import ctypes.util
+import logging
+import sys
+import threading
+
+import mss
+from PIL import Image
+
+from config import CAPTURE_BACKEND
+
+logger = logging.getLogger(__name__)
+
+
+class CaptureBackend:
+    """Grabs screen regions as RGB images. Subclasses implement grab()."""
+
+    name = "base"
+
+    def main_monitor(self) -> dict:
+        """Region dict (left, top, width, height) of the main monitor."""
+        with mss.mss() as sct:
+            # monitors[0] = all monitors combined, monitors[1] = main monitor only
+            return dict(sct.monitors[1])
+
+    def grab(self, region: dict) -> Image.Image:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class MssBackend(CaptureBackend):
+    name = "mss"
+
+    def grab(self, region: dict) -> Image.Image:
+        with mss.mss() as sct:
+            screenshot = sct.grab(region)
+            return Image.frombytes("RGB", screenshot.size, screenshot.bgra, "raw", "BGRX")
+
+
+# ── XShm via ctypes ───────────────────────────────────────────────────────
+
+class _XImage(ctypes.Structure):
+    # Leading fields of Xlib's XImage; only these are read or written
+    _fields_ = [
+        ("width", ctypes.c_int),
+        ("height", ctypes.c_int),
+        ("xoffset", ctypes.c_int),
+        ("format", ctypes.c_int),
+        ("data", ctypes.c_void_p),
+        ("byte_order", ctypes.c_int),
+        ("bitmap_unit", ctypes.c_int),
+        ("bitmap_bit_order", ctypes.c_int),
+        ("bitmap_pad", ctypes.c_int),
+        ("depth", ctypes.c_int),
+        ("bytes_per_line", ctypes.c_int),
+        ("bits_per_pixel", ctypes.c_int),
+    ]
+
+
+class _XShmSegmentInfo(ctypes.Structure):
+    _fields_ = [
+        ("shmseg", ctypes.c_ulong),
+        ("shmid", ctypes.c_int),
+        ("shmaddr", ctypes.c_void_p),
+        ("readOnly", ctypes.c_int),
+    ]
+
+
+_ZPIXMAP = 2
+_ALL_PLANES = ctypes.c_ulong(0xFFFFFFFF)
+_IPC_PRIVATE = 0
+_IPC_CREAT = 0o1000
+_IPC_RMID = 0
+_LSB_FIRST = 0
+
+_X_ERROR_HANDLER = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_void_p, ctypes.c_void_p)
+
+
+class XShmBackend(CaptureBackend):
+    """
+    MIT-SHM grabs into one shared-memory segment, reused across grabs and
+    reallocated only when the region size changes. Raises RuntimeError from
+    __init__ when XShm cannot be used.
+    """
+
+    name = "xshm"
+
+    def __init__(self):
+        if not sys.platform.startswith("linux"):
+            raise RuntimeError("XShm backend is Linux-only")
+        x11_path, xext_path = ctypes.util.find_library("X11"), ctypes.util.find_library("Xext")
+        if not x11_path or not xext_path:
+            raise RuntimeError("libX11/libXext not found")
+        self._x11 = ctypes.CDLL(x11_path)
+        self._xext = ctypes.CDLL(xext_path)
+        self._libc = ctypes.CDLL(None, use_errno=True)
+        self._declare_signatures()
+
+        self._lock = threading.Lock()  # one X connection; grabs are serialized
+        self._image = None
+        self._shminfo = None
+        self._x_error = None
+        self._previous_handler = None
+        # Xlib's default error handler exits the process; record errors instead
+        self._error_handler = _X_ERROR_HANDLER(self._on_x_error)
+        self._error_handler_ptr = ctypes.cast(self._error_handler, ctypes.c_void_p)
+
+        self._display = self._x11.XOpenDisplay(None)
+        if not self._display:
+            raise RuntimeError("cannot open X display")
+        if not self._xext.XShmQueryExtension(self._display):
+            self._x11.XCloseDisplay(self._display)
+            raise RuntimeError("X server has no MIT-SHM extension")
+        screen = self._x11.XDefaultScreen(self._display)
+        self._root = self._x11.XRootWindow(self._display, screen)
+        self._visual = self._x11.XDefaultVisual(self._display, screen)
+        self._depth = self._x11.XDefaultDepth(self._display, screen)
+        self._main_monitor = None
+
+        # Attach a small segment now so remote displays etc. fail here, not mid-capture
+        try:
+            with self._trapping_x_errors():
+                self._allocate(16, 16)
+        except RuntimeError:
+            self.close()
+            raise
+
+    def _declare_signatures(self):
+        x11, xext, libc = self._x11, self._xext, self._libc
+        x11.XOpenDisplay.restype = ctypes.c_void_p
+        x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        x11.XCloseDisplay.argtypes = [ctypes.c_void_p]
+        x11.XDefaultScreen.argtypes = [ctypes.c_void_p]
+        x11.XRootWindow.restype = ctypes.c_ulong
+        x11.XRootWindow.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XDefaultVisual.restype = ctypes.c_void_p
+        x11.XDefaultVisual.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XDefaultDepth.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XSync.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XFree.argtypes = [ctypes.c_void_p]
+        x11.XSetErrorHandler.restype = ctypes.c_void_p
+        x11.XSetErrorHandler.argtypes = [ctypes.c_void_p]
+        xext.XShmQueryExtension.argtypes = [ctypes.c_void_p]
+        xext.XShmCreateImage.restype = ctypes.POINTER(_XImage)
+        xext.XShmCreateImage.argtypes = [
+            ctypes.c_void_p, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int, ctypes.c_void_p,
+            ctypes.POINTER(_XShmSegmentInfo), ctypes.c_uint, ctypes.c_uint,
+        ]
+        xext.XShmAttach.argtypes = [ctypes.c_void_p, ctypes.POINTER(_XShmSegmentInfo)]
+        xext.XShmDetach.argtypes = [ctypes.c_void_p, ctypes.POINTER(_XShmSegmentInfo)]
+        xext.XShmGetImage.argtypes = [
+            ctypes.c_void_p, ctypes.c_ulong, ctypes.POINTER(_XImage), ctypes.c_int, ctypes.c_int,
+            ctypes.c_ulong,
+        ]
+        libc.shmget.argtypes = [ctypes.c_int, ctypes.c_size_t, ctypes.c_int]
+        libc.shmat.restype = ctypes.c_void_p
+        libc.shmat.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_int]
+        libc.shmdt.argtypes = [ctypes.c_void_p]
+        libc.shmctl.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_void_p]
+
+    @contextlib.contextmanager
+    def _trapping_x_errors(self):
+        """Routes X errors to _on_x_error, restoring the previous (e.g. Tk's) handler after."""
+        previous = self._x11.XSetErrorHandler(self._error_handler_ptr)
+        self._previous_handler = _X_ERROR_HANDLER(previous) if previous else None
+        try:
+            yield
+        finally:
+            self._x11.XSetErrorHandler(previous)
+            self._previous_handler = None
+
+    def _on_x_error(self, display, event):
+        if display != self._display:
+            # Another connection's error (Tk's main loop) raised while ours is installed
+            previous = self._previous_handler
+            return previous(display, event) if previous is not None else 0
+        self._x_error = "X protocol error during XShm call"
+        return 0
+
+    def _check_x_error(self, what: str):
+        self._x11.XSync(self._display, 0)
+        if self._x_error:
+            self._x_error = None
+            raise RuntimeError(f"{what} failed")
+
+    def _allocate(self, width: int, height: int):
+        """(Re)creates the XImage + shared-memory segment for width x height."""
+        self._release()
+        shminfo = _XShmSegmentInfo()
+        image = self._xext.XShmCreateImage(
+            self._display, self._visual, self._depth, _ZPIXMAP, None, ctypes.byref(shminfo), width, height)
+        if not image:
+            raise RuntimeError("XShmCreateImage failed")
+        if image.contents.bits_per_pixel != 32 or image.contents.byte_order != _LSB_FIRST:
+            self._x11.XFree(image)
+            raise RuntimeError("XShm backend needs a 32bpp little-endian visual")
+
+        size = image.contents.bytes_per_line * height
+        shmid = self._libc.shmget(_IPC_PRIVATE, size, _IPC_CREAT | 0o600)
+        if shmid < 0:
+            self._x11.XFree(image)
+            raise RuntimeError(f"shmget failed (errno {ctypes.get_errno()})")
+        addr = self._libc.shmat(shmid, None, 0)
+        if addr in (None, ctypes.c_void_p(-1).value):
+            self._libc.shmctl(shmid, _IPC_RMID, None)
+            self._x11.XFree(image)
+            raise RuntimeError(f"shmat failed (errno {ctypes.get_errno()})")
+
+        shminfo.shmid = shmid
+        shminfo.shmaddr = addr
+        shminfo.readOnly = 0
+        image.contents.data = addr
+        self._image, self._shminfo = image, shminfo
+        self._xext.XShmAttach(self._display, ctypes.byref(shminfo))
+        try:
+            self._check_x_error("XShmAttach")
+        except RuntimeError:
+            self._shminfo = None  # never attached — don't detach in _release()
+            self._libc.shmdt(addr)
+            self._libc.shmctl(shmid, _IPC_RMID, None)
+            self._image.contents.data = None
+            self._x11.XFree(self._image)
+            self._image = None
+            raise
+        # Segment is freed automatically once both sides detach
+        self._libc.shmctl(shmid, _IPC_RMID, None)
+
+    def _release(self):
+        if self._image is None:
+            return
+        if self._shminfo is not None:
+            self._xext.XShmDetach(self._display, ctypes.byref(self._shminfo))
+            self._x11.XSync(self._display, 0)
+            self._libc.shmdt(self._shminfo.shmaddr)
+        self._image.contents.data = None  # shm is not malloc'd; XFree the struct only
+        self._x11.XFree(self._image)
+        self._image, self._shminfo = None, None
+
+    def main_monitor(self) -> dict:
+        if self._main_monitor is None:
+            self._main_monitor = super().main_monitor()
+        return dict(self._main_monitor)
+
+    def grab_view(self, region: dict) -> tuple[memoryview, tuple[int, int], int]:
+        """
+        Grabs region into the shared segment and returns (view, (w, h), stride).
+        view aliases the segment: it is only valid until the next grab, and
+        callers must hold no reference past that. Pixels are BGRX. Callers
+        hold self._lock inside _trapping_x_errors(), as grab() does.
+        """
+        width, height = region["width"], region["height"]
+        if self._image is None or (self._image.contents.width, self._image.contents.height) != (width, height):
+            self._allocate(width, height)
+        ok = self._xext.XShmGetImage(
+            self._display, self._root, self._image, region["left"], region["top"], _ALL_PLANES)
+        if not ok:
+            self._check_x_error("XShmGetImage")
+            raise RuntimeError("XShmGetImage failed")
+        stride = self._image.contents.bytes_per_line
+        buf = (ctypes.c_char * (stride * height)).from_address(self._shminfo.shmaddr)
+        return memoryview(buf), (width, height), stride
+
+    def grab(self, region: dict) -> Image.Image:
+        with self._lock, self._trapping_x_errors():
+            view, size, stride = self.grab_view(region)
+            # Single pass: BGRX in shared memory -> RGB image
+            return Image.frombuffer("RGB", size, view, "raw", "BGRX", stride, 1)
+
+    def close(self):
+        with self._lock, self._trapping_x_errors():
+            if self._display:
+                self._release()
+                self._x11.XCloseDisplay(self._display)
+                self._display = None
+
+
+_BACKENDS = {"mss": MssBackend, "xshm": XShmBackend}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def create_backend(name: str = CAPTURE_BACKEND) -> CaptureBackend:
+    """
+    Builds a backend by name ("auto", "xshm", "mss"). "auto" tries XShm on
+    Linux and falls back to mss; an explicit "xshm" also falls back, with a warning.
+    The default CAPTURE_BACKEND is "mss" (see the module docstring).
+    """
+    if name == "auto":
+        name = "xshm" if sys.platform.startswith("linux") else "mss"
+    if name not in _BACKENDS:
+        raise ValueError(f"unknown capture backend '{name}' (expected auto, {', '.join(_BACKENDS)})")
+    if name == "xshm":
+        try:
+            return XShmBackend()
+        except (RuntimeError, OSError) as e:
+            logger.warning("XShm capture unavailable (%s); falling back to mss", e)
+            return MssBackend()
+    return _BACKENDS[name]()
+
+
+def get_backend() -> CaptureBackend:
+    """Shared backend instance for capture.py, created on first use."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = create_backend()
+            logger.info("Capture backend: %s", _backend.name)
+        return _backend
@@ -1,27 +1,3 @@
-from pynput import keyboard
-
-# Hotkey to trigger screen capture
-HOTKEY = {keyboard.Key.ctrl, keyboard.Key.shift, keyboard.Key.space}
-
-# Hotkey to send clipboard text to Claude
-CLIPBOARD_HOTKEY = {keyboard.Key.ctrl, keyboard.Key.shift, keyboard.Key.enter}
-
-# Hotkey to toggle window visibility (Ctrl+\)
-TOGGLE_HOTKEY = {keyboard.Key.ctrl, keyboard.KeyCode.from_char('\\')}
-
-# Hotkey for selection screenshot (Ctrl+Shift+S)
-SELECTION_HOTKEY = {keyboard.Key.ctrl, keyboard.Key.shift, keyboard.KeyCode.from_char('s')}
-
-# Hotkey to cycle prompt modes (Ctrl+Shift+P)
-CYCLE_PROMPT_HOTKEY = {keyboard.Key.ctrl, keyboard.Key.shift, keyboard.KeyCode.from_char('p')}
-
-# Hotkey to toggle cursor visibility (Ctrl+Shift+C)
-CURSOR_HOTKEY = {keyboard.Key.ctrl, keyboard.Key.shift, keyboard.KeyCode.from_char('c')}
-
-# Arrow key movement settings
-MOVE_MODIFIER = keyboard.Key.ctrl
-MOVE_STEP = 20  # pixels per keypress
-
 # Overlay window settings
 WINDOW_WIDTH  = 650
 WINDOW_HEIGHT = 500
@@ -29,11 +5,96 @@ WINDOW_X      = 50     # pixels from left edge of screen
 WINDOW_Y      = 50     # pixels from top of screen
 WINDOW_ALPHA  = 0.92   # transparency: 0.0 = invisible, 1.0 = fully opaque
 
+# Screen-grab backend: "mss", "xshm" (Linux/X11 MIT-SHM, opt-in) or "auto"
+# (XShm on Linux/X11, else mss). Benchmark with `python bench_capture.py`.
+CAPTURE_BACKEND = "mss"
+
+# Differential follow-ups (frame_diff.py)
+DIFF_BLOCK = 32                 # block-hash grid cell size, pixels
+DIFF_MAX_REGIONS = 6            # changed regions sent as separate crops
+DIFF_MAX_COMPONENTS = 48        # more scattered changes than this: one bounding box
+MAX_REQUEST_IMAGES = 20         # Bedrock Converse limit; older diff crops are pruned
+DIFF_FULL_FRAME_RATIO = 0.6     # send the whole frame if more than this changed
+DIFF_QUESTION = "What about now?"
+
+# Local OCR pre-pass (ocr.py): send extracted text instead of the screenshot
+# when OCR is confident. Needs the tesseract CLI on PATH.
+OCR_ENABLED = False
+OCR_BACKEND = "tesseract"
+OCR_MIN_CONFIDENCE = 85   # mean word confidence (0-100) required to send text
+OCR_MIN_CHARS = 40        # shorter extractions are probably a diagram/UI — send the image
+OCR_TIMEOUT_S = 1.5       # image is sent if OCR has not finished by then
+OCR_WORKERS = 2
+
+# Background frame sampler (sampler.py): keeps recent frames pre-encoded so
+# the capture hotkey can skip the PNG encode. Off by default.
+SAMPLER_ENABLED = False
+SAMPLER_INTERVAL_S = 1.0        # sampling period while the screen is changing
+SAMPLER_MAX_INTERVAL_S = 8.0    # backed-off period once the screen is static
+SAMPLER_STATIC_AFTER = 3        # unchanged samples before backing off (then suspending)
+SAMPLER_MAX_FRAMES = 8
+SAMPLER_MAX_BYTES = 32 * 1024 * 1024
+SAMPLER_MAX_CPU = 0.10          # fraction of one core the sampler may use
+SAMPLER_VERIFY = True           # grab + hash on hotkey to confirm the frame is current
+SAMPLER_MAX_AGE_S = 2.0         # without verify: newest frame must be this fresh
+
+# On-demand profiling (profiler.py)
+PROFILE_REQUESTS = 3             # requests per profiling session (hotkey default)
+PROFILE_DIR = "~/interview_profiles"
+PROFILE_INTERVAL_MS = 5          # stack sampling period
+PROFILE_TRACEMALLOC_FRAMES = 10
+PROFILE_TOP_ALLOCATIONS = 25
+
+# Model backend (backends.py): "bedrock" (AWS Bedrock Converse) or "openai"
+# (local OpenAI-compatible server, e.g. llama.cpp `llama-server --port 8080`).
+# Stream latency metrics are keyed by backend name, so switch this to compare them.
+MODEL_BACKEND = "bedrock"
+LOCAL_BASE_URL = "http://127.0.0.1:8080"   # /v1/chat/completions is appended
+LOCAL_MODEL = "local"                       # llama-server serves whatever it loaded
+LOCAL_DRAFT_MODEL = LOCAL_MODEL
+LOCAL_API_KEY = None
+LOCAL_TIMEOUT_S = 120
+
 # AWS Bedrock settings
 AWS_REGION = "us-east-1"
 AWS_PROFILE = "saml"
 BEDROCK_MODEL = "us.anthropic.claude-haiku-4-5-20251001-v1:0"
 
+# Continuation requests allowed when a response stream breaks mid-answer
+STREAM_MAX_RESUMES = 2
+
+# Max model streams in flight at once (full answers + drafts)
+MAX_CONCURRENT_STREAMS = 4
+
+# Headless batch mode (batch.py)
+BATCH_CONCURRENCY = 8        # worker threads / concurrent Bedrock streams
+BATCH_RATE = 2.0             # max request starts per second (token bucket refill)
+BATCH_BURST = 4              # token bucket size
+BATCH_MAX_ATTEMPTS = 5       # per item; only throttled requests are retried
+
+# Bedrock connection pool and keep-warm (bedrock_client.py)
+BEDROCK_POOL_CONNECTIONS = max(MAX_CONCURRENT_STREAMS, BATCH_CONCURRENCY) + 2
+PREWARM_CONNECTIONS = MAX_CONCURRENT_STREAMS   # opened in parallel at startup
+KEEPWARM_ENABLED = True
+KEEPWARM_INTERVAL_S = 45       # ping once the pool has been idle this long
+KEEPWARM_MAX_PER_HOUR = 60     # hard cap on keep-warm pings
+KEEPWARM_IDLE_STOP_S = 30 * 60 # stop pinging after this long without real requests
+WARM_WINDOW_S = 60             # a request within this long of the last use counts as "warm"
+
+# Local IPC service (service.py): localhost HTTP + server-sent events.
+# Runs inside the overlay process, sharing its model backend and stream cap.
+SERVICE_ENABLED = False
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8765
+SERVICE_TOKEN_FILE = "~/.interview_assistant/service_token"   # bearer token, mode 0600
+
+# Two-tier speculative answering: a small fast model drafts 🧠 PROBLEM / 💡 APPROACH
+# while BEDROCK_MODEL streams the full answer. Only Interview-format modes are drafted.
+# Point BEDROCK_MODEL at a stronger model when enabling this; main.py refuses to
+# speculate while the draft and full models are the same (double cost, no gain).
+SPECULATIVE_ENABLED = False
+DRAFT_MODEL = "us.anthropic.claude-haiku-4-5-20251001-v1:0"
+
 # Shared response format
 _RESPONSE_FORMAT = """
 🧠 PROBLEM
@@ -61,6 +122,20 @@ PROMPTS = {
 }
 PROMPT_NAMES = list(PROMPTS.keys())
 
+# Headings of _RESPONSE_FORMAT, used to end the stream once every section is done
+RESPONSE_SECTIONS = [line for line in _RESPONSE_FORMAT.splitlines() if line.strip() and line.isupper()]
+
+# Per-mode output budgets and stop sequences
+#   max_tokens       — Bedrock maxTokens for the answer
+#   stop_sequences   — server-side stop sequences
+#   stop_on_sections — end client-side once all RESPONSE_SECTIONS are complete
+MODE_LIMITS = {
+    "Interview": {"max_tokens": 2048, "stop_sequences": [], "stop_on_sections": True},
+    "Debug": {"max_tokens": 700, "stop_sequences": [], "stop_on_sections": False},
+    "System Design": {"max_tokens": 2048, "stop_sequences": [], "stop_on_sections": False},
+    "Behavioral": {"max_tokens": 800, "stop_sequences": [], "stop_on_sections": False},
+}
+
 # Default prompt (for backward compatibility)
 PROMPT = PROMPTS["Interview"]
 
@@ -75,3 +150,13 @@ TEXT_PROMPT = TEXT_PROMPTS["Interview"]
 
 # Lighter prompt for follow-up questions (no format constraint)
 FOLLOWUP_PROMPT = "Continue helping with the coding interview problem. The user has a follow-up question. Give a clear, concise answer."
+FOLLOWUP_LIMITS = {"max_tokens": 1024, "stop_sequences": [], "stop_on_sections": False}
+
+# Fast draft: only the opening sections, cut off at the complexity heading
+DRAFT_PROMPT = (
+    "You are helping me solve a coding interview problem.\n"
+    "Analyze the input and respond with ONLY these sections, briefly:"
+    + _RESPONSE_FORMAT.split(RESPONSE_SECTIONS[2])[0]
+)
+DRAFT_MODES = [name for name, prompt in PROMPTS.items() if _RESPONSE_FORMAT in prompt]
+DRAFT_LIMITS = {"max_tokens": 400, "stop_sequences": [RESPONSE_SECTIONS[2]], "stop_on_sections": False}
@@ -0,0 +1,154 @@
+"""
+Differential follow-up captures: find what changed between the last frame
+sent to Claude and a new one, and send only those regions.
+
+Frames are split into a grid of DIFF_BLOCK x DIFF_BLOCK blocks, each hashed
+straight from the raw pixel rows. Changed blocks are grouped into rectangles
+(connected components, then merged if there are too many), cropped, and sent
+as image blocks — so request size scales with the changed area, not the screen.
+"""
+import hashlib
+from dataclasses import dataclass
+
+from PIL import Image
+
+from capture import encode_png
+from config import DIFF_BLOCK, DIFF_MAX_REGIONS, DIFF_MAX_COMPONENTS, DIFF_FULL_FRAME_RATIO
+
+
+@dataclass
+class SentFrame:
+    """A frame sent to Claude; its block-hash grid is computed on first use."""
+    img: Image.Image
+    region: dict | None = None   # grab region (None = main monitor)
+    _grid: list | None = None
+
+    @property
+    def grid(self) -> list:
+        if self._grid is None:
+            self._grid = block_hashes(self.img)
+        return self._grid
+
+
+def block_hashes(img: Image.Image, block: int = DIFF_BLOCK) -> list[list[bytes]]:
+    """Per-block digests, grid[row][col], computed in one pass over the pixel rows."""
+    img = img.convert("RGB")
+    width, height = img.size
+    raw = img.tobytes()
+    stride = width * 3
+    cols = (width + block - 1) // block
+    grid = []
+    for top in range(0, height, block):
+        hashers = [hashlib.blake2b(digest_size=8) for _ in range(cols)]
+        for y in range(top, min(top + block, height)):
+            row = raw[y * stride:(y + 1) * stride]
+            for c, hasher in enumerate(hashers):
+                hasher.update(row[c * block * 3:(c + 1) * block * 3])
+        grid.append([h.digest() for h in hashers])
+    return grid
+
+
+def changed_boxes(old_grid: list, new_grid: list, size: tuple[int, int],
+                  block: int = DIFF_BLOCK, max_regions: int = DIFF_MAX_REGIONS,
+                  max_components: int = DIFF_MAX_COMPONENTS) -> list[tuple]:
+    """
+    Pixel boxes (left, top, right, bottom) covering every changed block.
+    Neighbouring changed blocks are grouped; beyond max_regions groups, the
+    closest boxes are merged until the count fits. The pairwise merge is
+    cubic in the group count, so more than max_components scattered groups
+    collapse straight into one bounding box instead.
+    """
+    rows, cols = len(new_grid), len(new_grid[0]) if new_grid else 0
+    changed = {(r, c) for r in range(rows) for c in range(cols) if old_grid[r][c] != new_grid[r][c]}
+
+    boxes = []
+    while changed:
+        stack = [changed.pop()]
+        r0 = r1 = stack[0][0]
+        c0 = c1 = stack[0][1]
+        while stack:
+            r, c = stack.pop()
+            r0, r1, c0, c1 = min(r0, r), max(r1, r), min(c0, c), max(c1, c)
+            for n in ((r - 1, c), (r + 1, c), (r, c - 1), (r, c + 1)):
+                if n in changed:
+                    changed.remove(n)
+                    stack.append(n)
+        boxes.append([c0, r0, c1, r1])
+
+    if len(boxes) > max_components:
+        boxes = [[min(b[0] for b in boxes), min(b[1] for b in boxes),
+                  max(b[2] for b in boxes), max(b[3] for b in boxes)]]
+
+    while len(boxes) > max_regions:
+        # Merge the pair whose combined box wastes the least area
+        best = None
+        for i in range(len(boxes)):
+            for j in range(i + 1, len(boxes)):
+                a, b = boxes[i], boxes[j]
+                merged = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+                waste = _cells(merged) - _cells(a) - _cells(b)
+                if best is None or waste < best[0]:
+                    best = (waste, i, j, merged)
+        _, i, j, merged = best
+        boxes[i] = merged
+        del boxes[j]
+
+    width, height = size
+    return [
+        (c0 * block, r0 * block, min(width, (c1 + 1) * block), min(height, (r1 + 1) * block))
+        for c0, r0, c1, r1 in boxes
+    ]
+
+
+def _cells(box) -> int:
+    return (box[2] - box[0] + 1) * (box[3] - box[1] + 1)
+
+
+def diff_content(previous: SentFrame | None, current: SentFrame, question: str) -> list | None:
+    """
+    Bedrock user-turn content for a "what about now?" follow-up.
+    Returns None if nothing changed. Falls back to the whole frame when sizes
+    differ, more than DIFF_FULL_FRAME_RATIO of the area changed, or previous
+    is None (the model never saw the previous frame's pixels).
+    """
+    size = current.img.size
+    if previous is None or previous.img.size != size:
+        boxes = [(0, 0, *size)]
+    else:
+        boxes = changed_boxes(previous.grid, current.grid, size)
+        if not boxes:
+            return None
+        changed_area = sum((r - l) * (b - t) for l, t, r, b in boxes)
+        if changed_area > DIFF_FULL_FRAME_RATIO * size[0] * size[1]:
+            boxes = [(0, 0, *size)]
+
+    if boxes == [(0, 0, *size)]:
+        intro = "The screen has changed substantially since the last screenshot. Here is the new screenshot."
+    else:
+        listed = "; ".join(f"x={l} y={t} w={r - l} h={b - t}" for l, t, r, b in boxes)
+        intro = (
+            f"The screen has changed since the last screenshot ({size[0]}x{size[1]}). "
+            f"Only the changed regions are attached, in order: {listed}."
+        )
+    content = [{"text": intro}]
+    for box in boxes:
+        content.append({"image": {"format": "png", "source": {"bytes": encode_png(current.img.crop(box))}}})
+    content.append({"text": question})
+    return content
+
+
+def prune_images(conversation: list, budget: int) -> int:
+    """
+    Replaces image blocks in earlier turns with a short text note so that at
+    most budget images remain. The first turn's images (the base screenshot)
+    are kept; after that the newest win. Modifies conversation in place and
+    returns the number of images dropped.
+    """
+    positions = [(t, b) for t, turn in enumerate(conversation)
+                 for b, block in enumerate(turn["content"]) if "image" in block]
+    base = [p for p in positions if p[0] == 0]
+    rest = [p for p in positions if p[0] != 0]
+    dropped = rest[:max(0, len(rest) - max(0, budget - len(base)))]
+    for t, b in dropped:
+        conversation[t]["content"][b] = {"text": "[earlier changed region omitted]"}
+    return len(dropped)
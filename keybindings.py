@@ -0,0 +1,36 @@
+"""
+Global hotkeys, kept apart from config.py so headless entry points (batch.py,
+service.py, tests) do not import pynput, which needs a display.
+"""
+from pynput import keyboard
+
+# Hotkey to trigger screen capture
+HOTKEY = {keyboard.Key.ctrl, keyboard.Key.shift, keyboard.Key.space}
+
+# Hotkey to send clipboard text to Claude
+CLIPBOARD_HOTKEY = {keyboard.Key.ctrl, keyboard.Key.shift, keyboard.Key.enter}
+
+# Hotkey to toggle window visibility (Ctrl+\)
+TOGGLE_HOTKEY = {keyboard.Key.ctrl, keyboard.KeyCode.from_char('\\')}
+
+# Hotkey for selection screenshot (Ctrl+Shift+S)
+SELECTION_HOTKEY = {keyboard.Key.ctrl, keyboard.Key.shift, keyboard.KeyCode.from_char('s')}
+
+# Hotkey to cycle prompt modes (Ctrl+Shift+P)
+CYCLE_PROMPT_HOTKEY = {keyboard.Key.ctrl, keyboard.Key.shift, keyboard.KeyCode.from_char('p')}
+
+# Hotkey to toggle cursor visibility (Ctrl+Shift+C)
+CURSOR_HOTKEY = {keyboard.Key.ctrl, keyboard.Key.shift, keyboard.KeyCode.from_char('c')}
+
+# Hotkey for a differential follow-up capture — "what about now?" (Ctrl+Shift+D)
+DIFF_HOTKEY = {keyboard.Key.ctrl, keyboard.Key.shift, keyboard.KeyCode.from_char('d')}
+
+# Hotkey to profile the next PROFILE_REQUESTS requests (Ctrl+Shift+R)
+PROFILE_HOTKEY = {keyboard.Key.ctrl, keyboard.Key.shift, keyboard.KeyCode.from_char('r')}
+
+# Hotkey to end the current answer early — "enough" (Ctrl+Shift+X)
+STOP_HOTKEY = {keyboard.Key.ctrl, keyboard.Key.shift, keyboard.KeyCode.from_char('x')}
+
+# Arrow key movement settings
+MOVE_MODIFIER = keyboard.Key.ctrl
+MOVE_STEP = 20  # pixels per keypress
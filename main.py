@@ -1,32 +1,63 @@
+import argparse
+import base64
 import sys
 import threading
 from pynput import keyboard
+import profiler
 from config import (
-    HOTKEY, CLIPBOARD_HOTKEY, TOGGLE_HOTKEY, SELECTION_HOTKEY, 
-    CYCLE_PROMPT_HOTKEY, CURSOR_HOTKEY, MOVE_MODIFIER, MOVE_STEP, PROMPTS, PROMPT_NAMES, TEXT_PROMPTS
+    DIFF_QUESTION, MAX_REQUEST_IMAGES, PROMPTS, PROMPT_NAMES,
+    TEXT_PROMPTS, MODE_LIMITS, SPECULATIVE_ENABLED, DRAFT_MODES, SERVICE_ENABLED, SERVICE_HOST, SERVICE_PORT,
+    OCR_ENABLED, SAMPLER_ENABLED, PROFILE_REQUESTS, MODEL_BACKEND,
 )
-from capture import capture_screen, capture_selection
-from bedrock import ask_claude, ask_claude_text, ask_claude_followup, test_connection
+from keybindings import (
+    HOTKEY, CLIPBOARD_HOTKEY, TOGGLE_HOTKEY, SELECTION_HOTKEY, CYCLE_PROMPT_HOTKEY, CURSOR_HOTKEY,
+    STOP_HOTKEY, DIFF_HOTKEY, PROFILE_HOTKEY, MOVE_MODIFIER, MOVE_STEP,
+)
+from capture import encode_image, grab, select_region
+from backends import get_backend
+from bedrock import ask_claude, ask_claude_text, ask_claude_followup, test_connection, start_keepwarm
+from frame_diff import SentFrame, diff_content, prune_images
 from window import OverlayWindow
 
-# Verify Bedrock connection before starting
-print("🔌 Testing Bedrock connection...")
+parser = argparse.ArgumentParser(description="Interview Assistant overlay")
+parser.add_argument("--profile", type=int, metavar="N",
+                    help="profile the next N requests (see profiler.py)")
+args = parser.parse_args()
+
+# Verify model backend connection before starting
+print(f"🔌 Testing {MODEL_BACKEND} connection...")
 try:
     test_connection()
-    print("✅ Bedrock connection successful")
+    print(f"✅ {MODEL_BACKEND} connection successful")
+    start_keepwarm()
 except Exception as e:
     print(f"❌ {e}")
-    print("\n⚠️  Fix your AWS credentials and try again.")
+    if MODEL_BACKEND == "bedrock":
+        print("\n⚠️  Fix your AWS credentials and try again.")
+    else:
+        print("\n⚠️  Start the local model server (LOCAL_BASE_URL) and try again.")
     sys.exit(1)
 
+# Speculative drafts only pay off with a draft model cheaper than the full one
+_speculative = SPECULATIVE_ENABLED
+if _speculative and get_backend().draft_model == get_backend().default_model:
+    print("⚠️  Speculative drafts disabled: the draft model is the same as the full model")
+    _speculative = False
+
 # Create overlay window
 app = OverlayWindow()
 
+# Optional background sampler keeping recent frames pre-encoded (sampler.py)
+_sampler = None
+
 # Track which keys are currently pressed (guarded by lock for thread safety)
 _key_lock = threading.Lock()
 _pressed_keys = set()
 _capturing = False
 
+# Set by the "enough" hotkey to end the in-flight answer early
+_stop_event = threading.Event()
+
 # Current prompt mode index
 _prompt_idx = 0
 
@@ -34,9 +65,31 @@ def _get_done_status():
     mode = PROMPT_NAMES[_prompt_idx]
     return f"[{mode}] Ctrl+Shift+Space=screenshot  Ctrl+\\\\=toggle"
 
+
+# Why a stream ended, as shown in the status bar (end_turn needs no note)
+_STOP_LABELS = {
+    "max_tokens": "output budget reached",
+    "stop_sequence": "stop sequence",
+    "sections_complete": "all sections complete",
+    "user_stop": "stopped by user",
+}
+
+
+def _finished_status(result: dict) -> str:
+    """Status bar text for a completed stream: why it ended and any mid-stream resumes."""
+    status = "✅ Done"
+    if result and result.get("stop_reason") in _STOP_LABELS:
+        status += f" — {_STOP_LABELS[result['stop_reason']]}"
+    if result and result.get("resumes"):
+        status += f" (resumed ×{result['resumes']}, ~{result['tokens_saved']} tokens saved)"
+    return f"{status}  |  {_get_done_status()}"
+
 # Conversation history for follow-ups (list of Bedrock message dicts)
 _conversation = []
 
+# Last screenshot sent in this conversation, for differential follow-ups
+_last_frame = None
+
 
 def _collect_response(token: str):
     """Callback that streams to overlay and accumulates the full response."""
@@ -47,23 +100,135 @@ def _collect_response(token: str):
 _response_parts = []
 
 
+class _DraftSwap:
+    """
+    Shows the fast-model draft until the full answer catches up with it,
+    then swaps the full answer in and streams the rest normally. If the
+    draft fails or ends empty, the full answer is shown straight away.
+    Swapping cancels the draft stream.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.cancelled = threading.Event()
+        self._draft_len = 0
+        self._held = []       # full-answer tokens held back while the draft is shown
+        self._held_len = 0
+        self._swapped = False
+
+    def on_draft(self, token: str):
+        with self._lock:
+            if self._swapped:
+                return
+            self._draft_len += len(token)
+            app.stream_draft_token(token)
+
+    def on_full(self, token: str):
+        _response_parts.append(token)
+        with self._lock:
+            if self._swapped:
+                app.stream_token(token)
+                return
+            self._held.append(token)
+            self._held_len += len(token)
+            if self._held_len >= self._draft_len > 0:
+                self._swap()
+
+    def draft_done(self):
+        """Called when the draft stream ends (finished, failed or cancelled)."""
+        with self._lock:
+            if not self._swapped and self._draft_len == 0:
+                self._swap()
+
+    def finish(self):
+        """Swap in whatever the full answer produced, even if it never caught up."""
+        with self._lock:
+            if not self._swapped:
+                self._swap()
+
+    def _swap(self):
+        self._swapped = True
+        self.cancelled.set()
+        app.replace_draft("".join(self._held))
+        self._held.clear()
+
+
+def _answer_callbacks():
+    """
+    Returns (on_token, draft, finish) for a fresh answer in the current mode.
+    Without speculation, or in a mode not in DRAFT_MODES, there is no draft
+    and finish() does nothing.
+    """
+    if not _speculative or PROMPT_NAMES[_prompt_idx] not in DRAFT_MODES:
+        return _collect_response, None, lambda: None
+    swap = _DraftSwap()
+    return swap.on_full, swap, swap.finish
+
+
+def _ask_about_image(img, on_token, draft, png_b64: str = None) -> tuple[dict, list]:
+    """
+    Sends a captured image to Claude — or its OCR text, when OCR_ENABLED and
+    the text is confident. png_b64 is the image's encoding if already known
+    (img may then be None). Returns (stream result, user turn content for
+    follow-ups). The content keeps the screenshot when img is known, so "what
+    about now?" crops can be read against it.
+    """
+    mode = PROMPT_NAMES[_prompt_idx]
+    if OCR_ENABLED and img is not None:
+        from ocr import prepare_capture
+        kind, payload = prepare_capture(img, png_b64)
+    else:
+        kind, payload = "image", png_b64 or encode_image(img)
+
+    if kind == "text":
+        app.set_status("🔤 Text detected — asking Claude...")
+        result = ask_claude_text(
+            payload, on_token, prompt=TEXT_PROMPTS[mode],
+            limits=MODE_LIMITS[mode], stop_event=_stop_event, draft=draft,
+        )
+        return result, [{"text": payload}]
+
+    app.set_status("🤔 Asking Claude...")
+    result = ask_claude(
+        payload, on_token, prompt=PROMPTS[mode],
+        limits=MODE_LIMITS[mode], stop_event=_stop_event, draft=draft,
+    )
+    user_content = [{"text": "Solve this problem."}]
+    if img is not None:
+        user_content.insert(0, {"image": {"format": "png", "source": {"bytes": base64.standard_b64decode(payload)}}})
+    return result, user_content
+
+
+@profiler.profiled("capture")
 def on_capture():
     """Runs in background thread. Capture -> API -> stream to overlay."""
-    global _response_parts
+    _capture_and_ask()
+
+
+def _capture_and_ask():
+    """on_capture()'s body, undecorated so on_diff_capture() can fall back to it without profiling twice."""
+    global _response_parts, _last_frame
     _response_parts = []
     _conversation.clear()
+    _last_frame = None
+    _stop_event.clear()
     app.clear()
     app.set_status("📸 Capturing screen...")
+    on_token, draft, finish = _answer_callbacks()
     try:
-        img_b64 = capture_screen()
-        app.set_status("🤔 Asking Claude...")
-        prompt = PROMPTS[PROMPT_NAMES[_prompt_idx]]
-        ask_claude(img_b64, _collect_response, prompt=prompt)
+        if _sampler:
+            img, png_b64 = _sampler.current_frame()
+        else:
+            img, png_b64 = grab(), None
+        result, user_content = _ask_about_image(img, on_token, draft, png_b64)
+        finish()
         full_reply = "".join(_response_parts)
-        _conversation.append({"role": "user", "content": [{"text": "Solve this problem."}]})
+        _conversation.append({"role": "user", "content": user_content})
         _conversation.append({"role": "assistant", "content": [{"text": full_reply}]})
-        app.set_status(f"✅ Done  |  {_get_done_status()}")
+        _last_frame = SentFrame(img) if img is not None else None
+        app.set_status(_finished_status(result))
     except Exception as e:
+        finish()
         app.stream_token(f"\n❌ Error: {e}\n")
         app.set_status("❌ Error — check terminal for details")
     finally:
@@ -72,21 +237,76 @@ def on_capture():
             _capturing = False
 
 
+@profiler.profiled("diff_capture")
+def on_diff_capture():
+    """
+    Runs in background thread. "What about now?": sends only the regions that
+    changed since the last screenshot, as a follow-up in the same conversation.
+    """
+    global _response_parts, _last_frame
+    if _last_frame is None or not _conversation:
+        _capture_and_ask()
+        return
+    _response_parts = []
+    _stop_event.clear()
+    app.set_status("📸 Capturing changes...")
+    asked = False
+    try:
+        current = SentFrame(grab(_last_frame.region), _last_frame.region)
+        # Crops only make sense against a screenshot the model has seen (not OCR text)
+        base_has_image = any("image" in block for block in _conversation[0]["content"])
+        content = diff_content(_last_frame if base_has_image else None, current, DIFF_QUESTION)
+        if content is None:
+            app.set_status(f"✅ No changes since the last capture  |  {_get_done_status()}")
+            return
+        if prune_images(_conversation, MAX_REQUEST_IMAGES - sum("image" in block for block in content)):
+            # Crops dropped since the base screenshot leave the model without the
+            # previous frame's pixels, so crops against it would not add up
+            content = diff_content(None, current, DIFF_QUESTION)
+        app.stream_token(f"\n\n─── {DIFF_QUESTION} ───\n\n")
+        app.set_status(f"🤔 Asking Claude ({len(content) - 2} changed region(s))...")
+        _conversation.append({"role": "user", "content": content})
+        asked = True
+        result = ask_claude_followup(_conversation, _collect_response, stop_event=_stop_event)
+        full_reply = "".join(_response_parts)
+        _conversation.append({"role": "assistant", "content": [{"text": full_reply}]})
+        _last_frame = current
+        app.set_status(_finished_status(result))
+    except Exception as e:
+        if asked:
+            _conversation.pop()  # keep user/assistant turns alternating
+        app.stream_token(f"\n❌ Error: {e}\n")
+        app.set_status("❌ Error — check terminal for details")
+    finally:
+        with _key_lock:
+            global _capturing
+            _capturing = False
+
+
+@profiler.profiled("clipboard")
 def _on_clipboard_text(text: str):
     """Runs in background thread. Clipboard text -> API -> stream to overlay."""
-    global _response_parts
+    global _response_parts, _last_frame
     _response_parts = []
     _conversation.clear()
+    _last_frame = None
+    _stop_event.clear()
     app.clear()
     app.set_status("🤔 Asking Claude...")
+    on_token, draft, finish = _answer_callbacks()
     try:
-        prompt = TEXT_PROMPTS[PROMPT_NAMES[_prompt_idx]]
-        ask_claude_text(text, _collect_response, prompt=prompt)
+        mode = PROMPT_NAMES[_prompt_idx]
+        result = ask_claude_text(
+            text, on_token, prompt=TEXT_PROMPTS[mode],
+            limits=MODE_LIMITS[mode], stop_event=_stop_event, draft=draft,
+        )
+        finish()
         full_reply = "".join(_response_parts)
         _conversation.append({"role": "user", "content": [{"text": text}]})
         _conversation.append({"role": "assistant", "content": [{"text": full_reply}]})
-        app.set_status(f"✅ Done  |  {_get_done_status()}")
+        app.set_status(_finished_status(result))
     except Exception as e:
+        finish()
         app.stream_token(f"\n❌ Error: {e}\n")
         app.set_status("❌ Error — check terminal for details")
     finally:
@@ -118,17 +338,19 @@ def _on_followup(text: str):
             return
         _capturing = True
 
+    @profiler.profiled("followup")
     def _run():
         global _response_parts
         _response_parts = []
+        _stop_event.clear()
         app.stream_token("\n\n─── Follow-up ───\n\n")
         app.set_status("🤔 Asking Claude...")
         try:
             _conversation.append({"role": "user", "content": [{"text": text}]})
-            ask_claude_followup(_conversation, _collect_response)
+            result = ask_claude_followup(_conversation, _collect_response, stop_event=_stop_event)
             full_reply = "".join(_response_parts)
             _conversation.append({"role": "assistant", "content": [{"text": full_reply}]})
-            app.set_status(f"✅ Done  |  {_get_done_status()}")
+            app.set_status(_finished_status(result))
         except Exception as e:
             app.stream_token(f"\n❌ Error: {e}\n")
             app.set_status("❌ Error — check terminal for details")
@@ -144,27 +366,33 @@ def _on_selection_capture():
     """Called on main thread. Opens selection UI, then sends to Claude."""
     global _capturing
     app.set_status("🎯 Click and drag to select region...")
-    img_b64 = capture_selection(app.root)
-    if img_b64 is None:
+    region = select_region(app.root)
+    img = grab(region) if region else None
+    if img is None:
         app.set_status("❌ Selection cancelled")
         with _key_lock:
             _capturing = False
         return
     
+    @profiler.profiled("selection")
     def _process():
-        global _response_parts
+        global _response_parts, _last_frame
         _response_parts = []
         _conversation.clear()
+        _last_frame = None
+        _stop_event.clear()
         app.clear()
-        app.set_status("🤔 Asking Claude...")
+        on_token, draft, finish = _answer_callbacks()
         try:
-            prompt = PROMPTS[PROMPT_NAMES[_prompt_idx]]
-            ask_claude(img_b64, _collect_response, prompt=prompt)
+            result, user_content = _ask_about_image(img, on_token, draft)
+            finish()
             full_reply = "".join(_response_parts)
-            _conversation.append({"role": "user", "content": [{"text": "Solve this problem."}]})
+            _conversation.append({"role": "user", "content": user_content})
             _conversation.append({"role": "assistant", "content": [{"text": full_reply}]})
-            app.set_status(f"✅ Done  |  {_get_done_status()}")
+            _last_frame = SentFrame(img, region)
+            app.set_status(_finished_status(result))
         except Exception as e:
+            finish()
             app.stream_token(f"\n❌ Error: {e}\n")
             app.set_status("❌ Error — check terminal for details")
         finally:
@@ -184,6 +412,15 @@ def _cycle_prompt():
     app.set_status(f"🔄 Switched to [{mode}] mode")
 
 
+def _start_profiling(requests: int):
+    """Start a profiling session for the next `requests` requests."""
+    report_dir = profiler.start(requests)
+    if report_dir is None:
+        app.set_status("⏱️ Already profiling")
+    else:
+        app.set_status(f"⏱️ Profiling next {requests} request(s) → {report_dir}")
+
+
 def _handle_arrow_movement(key):
     """Move window with arrow keys when modifier is held."""
     dx, dy = 0, 0
@@ -201,6 +438,8 @@ def _handle_arrow_movement(key):
 
 def on_press(key):
     global _capturing
+    if _sampler:
+        _sampler.wake()  # any typing may change the screen
     with _key_lock:
         _pressed_keys.add(key)
         
@@ -227,6 +466,18 @@ def on_press(key):
             app.set_status(f"🖱️ Cursor {status} (stealth mode)")
             return
         
+        # Check profiling hotkey (Ctrl+Shift+R)
+        if all(k in _pressed_keys for k in PROFILE_HOTKEY):
+            _start_profiling(PROFILE_REQUESTS)
+            return
+        
+        # Check "enough" hotkey (Ctrl+Shift+X) — ends the in-flight answer
+        if all(k in _pressed_keys for k in STOP_HOTKEY):
+            if _capturing:
+                _stop_event.set()
+                app.set_status("✋ Stopping...")
+            return
+        
         # Check selection screenshot hotkey (Ctrl+Shift+S)
         if all(k in _pressed_keys for k in SELECTION_HOTKEY):
             if _capturing:
@@ -238,11 +489,15 @@ def on_press(key):
         # Check full screenshot hotkey
         screenshot_active = all(k in _pressed_keys for k in HOTKEY)
         clipboard_active = all(k in _pressed_keys for k in CLIPBOARD_HOTKEY)
+        diff_active = all(k in _pressed_keys for k in DIFF_HOTKEY)
         if _capturing:
             return
         if screenshot_active:
             _capturing = True
             target = on_capture
+        elif diff_active:
+            _capturing = True
+            target = on_diff_capture
         elif clipboard_active:
             _capturing = True
             target = None  # clipboard uses root.after instead
@@ -266,16 +521,34 @@ app.on_followup = _on_followup
 listener = keyboard.Listener(on_press=on_press, on_release=on_release)
 listener.start()
 
+if args.profile:
+    _start_profiling(args.profile)
+
+if SAMPLER_ENABLED:
+    from sampler import FrameSampler
+    _sampler = FrameSampler(is_busy=lambda: _capturing)
+    _sampler.start()
+
+# Local IPC service shares this process's model backend and stream cap (token in SERVICE_TOKEN_FILE)
+if SERVICE_ENABLED:
+    from service import start_service
+    start_service(SERVICE_HOST, SERVICE_PORT)
+
 print("🤖 Interview Assistant running.")
 print("   Ctrl+Shift+Space  → capture full screen")
 print("   Ctrl+Shift+S      → selection screenshot")
+print("   Ctrl+Shift+D      → what about now? (send only what changed)")
 print("   Ctrl+Shift+Enter  → send clipboard text")
 print("   Ctrl+Shift+P      → cycle prompt mode")
 print("   Ctrl+Shift+C      → toggle cursor (stealth)")
+print("   Ctrl+Shift+X      → stop the current answer (enough)")
+print("   Ctrl+Shift+R      → profile the next requests")
 print("   Ctrl+\\            → toggle window visibility")
 print("   Ctrl+Arrow        → move window")
 print("   Drag corners/edges to resize window")
 print("   Close the overlay window (✕) to quit.")
+if SERVICE_ENABLED:
+    print(f"   Local service     → http://{SERVICE_HOST}:{SERVICE_PORT}")
 
 app.root.mainloop()
 
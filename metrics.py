@@ -0,0 +1,59 @@
+"""
+In-process metrics shared by the Bedrock, capture and UI layers.
+
+Counters and latency samples live in memory; snapshot() returns a summary
+that main.py (or anything else) can print or show in the overlay.
+"""
+import logging
+import threading
+from collections import defaultdict, deque
+
+logger = logging.getLogger(__name__)
+
+_MAX_SAMPLES = 200  # latency samples kept per metric
+
+_lock = threading.Lock()
+_counters = defaultdict(int)
+_timings = defaultdict(lambda: deque(maxlen=_MAX_SAMPLES))
+
+
+def incr(name: str, value: int = 1):
+    """Add value to the named counter."""
+    with _lock:
+        _counters[name] += value
+
+
+def observe(name: str, ms: float):
+    """Record a latency sample (milliseconds) for the named metric."""
+    with _lock:
+        _timings[name].append(ms)
+    logger.debug("%s = %.1f ms", name, ms)
+
+
+def snapshot() -> dict:
+    """
+    Returns {"counters": {...}, "timings": {name: {count, last, p50, p95}}}.
+    Percentiles are computed over the most recent samples only.
+    """
+    with _lock:
+        counters = dict(_counters)
+        samples = {name: list(values) for name, values in _timings.items()}
+    timings = {}
+    for name, values in samples.items():
+        if not values:
+            continue
+        ordered = sorted(values)
+        timings[name] = {
+            "count": len(values),
+            "last": values[-1],
+            "p50": ordered[len(ordered) // 2],
+            "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        }
+    return {"counters": counters, "timings": timings}
+
+
+def reset():
+    """Drop all recorded counters and samples."""
+    with _lock:
+        _counters.clear()
+        _timings.clear()
@@ -0,0 +1,170 @@
+"""
+Local text-extraction pre-pass: send OCR'd text instead of pixels when a
+capture is clearly just code or a problem statement.
+
+prepare_capture() runs OCR and PNG encoding in parallel, on separate worker
+pools so a slow OCR job never queues an encode. If OCR comes back in time
+with enough confident text, the text path wins. Otherwise the already-running
+encode is used, so the image path only waits for OCR up to OCR_TIMEOUT_S —
+and the OCR subprocess is killed at that deadline rather than left holding
+its worker.
+"""
+import csv
+import io
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from dataclasses import dataclass
+
+from PIL import Image
+
+import metrics
+from capture import encode_image
+from config import OCR_BACKEND, OCR_MIN_CONFIDENCE, OCR_MIN_CHARS, OCR_TIMEOUT_S, OCR_WORKERS
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class OcrResult:
+    text: str
+    confidence: float  # 0-100, mean word confidence weighted by word length
+
+
+class OcrBackend:
+    """Extracts text from an image. Subclasses implement extract()."""
+
+    name = "base"
+
+    def extract(self, img: Image.Image, timeout: float = None) -> OcrResult:
+        """timeout (seconds) bounds the extraction; implementations raise on expiry."""
+        raise NotImplementedError
+
+
+class TesseractBackend(OcrBackend):
+    """Runs the tesseract CLI once per image, producing text (txt) and word confidences (tsv)."""
+
+    name = "tesseract"
+
+    def __init__(self, binary: str = "tesseract", timeout: float = 10.0):
+        self.binary = shutil.which(binary)
+        if not self.binary:
+            raise RuntimeError(f"'{binary}' not found on PATH")
+        self.timeout = timeout
+
+    def extract(self, img: Image.Image, timeout: float = None) -> OcrResult:
+        buf = io.BytesIO()
+        # Uncompressed input — tesseract decodes it faster than PNG
+        img.convert("L").save(buf, format="BMP")
+        with tempfile.TemporaryDirectory() as tmp:
+            out_base = os.path.join(tmp, "out")
+            subprocess.run(
+                [self.binary, "stdin", out_base, "-c", "preserve_interword_spaces=1", "txt", "tsv"],
+                input=buf.getvalue(), capture_output=True, check=True,
+                timeout=min(timeout, self.timeout) if timeout is not None else self.timeout,
+            )
+            with open(out_base + ".txt", encoding="utf-8") as f:
+                text = f.read()
+            with open(out_base + ".tsv", encoding="utf-8") as f:
+                confidence = _tsv_confidence(f.read())
+        return OcrResult(text=text.strip(), confidence=confidence)
+
+
+def _tsv_confidence(tsv: str) -> float:
+    """Mean word confidence from tesseract TSV output, weighted by word length."""
+    total = weight = 0.0
+    for row in csv.DictReader(io.StringIO(tsv), delimiter="\t", quoting=csv.QUOTE_NONE):
+        word = (row.get("text") or "").strip()
+        try:
+            conf = float(row.get("conf") or -1)
+        except ValueError:
+            continue
+        if word and conf >= 0:
+            total += conf * len(word)
+            weight += len(word)
+    return total / weight if weight else 0.0
+
+
+_BACKENDS = {"tesseract": TesseractBackend}
+
+_backend = None
+_backend_failed = False
+_ocr_pool = None
+_encode_pool = None
+_lock = threading.Lock()
+
+
+def get_backend() -> OcrBackend | None:
+    """Shared OCR backend, or None if it cannot be created (logged once)."""
+    global _backend, _backend_failed
+    with _lock:
+        if _backend is None and not _backend_failed:
+            try:
+                _backend = _BACKENDS[OCR_BACKEND]()
+            except (KeyError, RuntimeError) as e:
+                _backend_failed = True
+                logger.warning("OCR backend '%s' unavailable (%s); sending images", OCR_BACKEND, e)
+        return _backend
+
+
+def _get_pools() -> tuple[ThreadPoolExecutor, ThreadPoolExecutor]:
+    """(OCR pool, encode pool)."""
+    global _ocr_pool, _encode_pool
+    with _lock:
+        if _ocr_pool is None:
+            _ocr_pool = ThreadPoolExecutor(max_workers=OCR_WORKERS, thread_name_prefix="ocr")
+            _encode_pool = ThreadPoolExecutor(max_workers=OCR_WORKERS, thread_name_prefix="ocr-encode")
+        return _ocr_pool, _encode_pool
+
+
+def _timed_extract(backend: OcrBackend, img: Image.Image, deadline: float) -> OcrResult:
+    started = time.perf_counter()
+    remaining = deadline - started
+    if remaining <= 0:
+        raise subprocess.TimeoutExpired("ocr", 0)  # waited in the queue past the deadline
+    # Killed at the same deadline prepare_capture() stops waiting at
+    result = backend.extract(img, timeout=remaining)
+    metrics.observe("ocr.extract_ms", (time.perf_counter() - started) * 1000)
+    return result
+
+
+def prepare_capture(img: Image.Image, png_b64: str = None) -> tuple[str, str]:
+    """
+    Returns ("text", extracted_text) when OCR is confident, else ("image", png_b64).
+    OCR and encoding run concurrently; OCR is abandoned after OCR_TIMEOUT_S.
+    Pass png_b64 if img is already encoded (e.g. by the frame sampler).
+    """
+    backend = get_backend()
+    ocr_pool, encode_pool = _get_pools()
+    if png_b64 is not None:
+        encoded = Future()
+        encoded.set_result(png_b64)
+    else:
+        encoded = encode_pool.submit(encode_image, img)
+    if backend is None:
+        return "image", encoded.result()
+
+    ocr = ocr_pool.submit(_timed_extract, backend, img, time.perf_counter() + OCR_TIMEOUT_S)
+    try:
+        result = ocr.result(timeout=OCR_TIMEOUT_S)
+    except FutureTimeout:
+        ocr.cancel()  # if still queued; a running job is killed at the same deadline
+        metrics.incr("ocr.timeouts")
+        logger.info("OCR slower than %.1fs; sending image", OCR_TIMEOUT_S)
+    except Exception as e:  # tesseract failure or timeout, undecodable output, bad TSV, ...
+        metrics.incr("ocr.errors")
+        logger.warning("OCR failed (%s); sending image", e)
+    else:
+        if result.confidence >= OCR_MIN_CONFIDENCE and len(result.text) >= OCR_MIN_CHARS:
+            metrics.incr("ocr.routed.text")
+            logger.info("OCR confidence %.0f, %d chars; sending text", result.confidence, len(result.text))
+            return "text", result.text
+        logger.info("OCR confidence %.0f, %d chars; sending image", result.confidence, len(result.text))
+
+    metrics.incr("ocr.routed.image")
+    return "image", encoded.result()
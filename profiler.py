@@ -0,0 +1,139 @@
+"""
+On-demand profiling for the next N requests (hotkey or `main.py --profile N`).
+
+While a session is active:
+  - a sampler thread snapshots every thread's stack (pynput listener, Tk main
+    loop, request workers, encoder/OCR pools, stream loops) every
+    PROFILE_INTERVAL_MS and aggregates them as collapsed stacks
+  - tracemalloc traces allocations
+
+Each session writes to PROFILE_DIR/<timestamp>/:
+  stacks.folded     collapsed stacks ("thread;file:func;... count"), for flamegraph.pl / speedscope
+  allocations.txt   top allocation sites at the end of the session
+  requests.jsonl    per request: wall time, process CPU time, peak traced memory
+
+With no session active, @profiled costs one global lookup per request.
+"""
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+from config import PROFILE_DIR, PROFILE_INTERVAL_MS, PROFILE_TOP_ALLOCATIONS, PROFILE_TRACEMALLOC_FRAMES
+
+logger = logging.getLogger(__name__)
+
+
+class _Session:
+    def __init__(self, requests: int, out_dir: str):
+        self.remaining = requests
+        self.out_dir = out_dir
+        self.stacks = Counter()
+        self.records = []
+        self.lock = threading.Lock()
+        self.stop = threading.Event()
+        self.thread = threading.Thread(target=self._sample, name="profiler", daemon=True)
+
+    def _sample(self):
+        own = threading.get_ident()
+        interval = PROFILE_INTERVAL_MS / 1000
+        while not self.stop.wait(interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                self.stacks[";".join(reversed(stack))] += 1
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def active() -> bool:
+    return _session is not None
+
+
+def start(requests: int, out_dir: str = PROFILE_DIR) -> str | None:
+    """Profiles the next `requests` requests. Returns the report dir, or None if already running."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            return None
+        report_dir = os.path.join(os.path.expanduser(out_dir), datetime.now().strftime("%Y%m%d_%H%M%S"))
+        os.makedirs(report_dir, exist_ok=True)
+        tracemalloc.start(PROFILE_TRACEMALLOC_FRAMES)
+        _session = _Session(requests, report_dir)
+        _session.thread.start()
+    logger.info("Profiling next %d request(s) → %s", requests, report_dir)
+    return report_dir
+
+
+def _finish(session: _Session):
+    session.stop.set()
+    session.thread.join()
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    with open(os.path.join(session.out_dir, "stacks.folded"), "w") as f:
+        for stack, count in session.stacks.most_common():
+            f.write(f"{stack} {count}\n")
+    with open(os.path.join(session.out_dir, "allocations.txt"), "w") as f:
+        snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+        for stat in snapshot.statistics("traceback")[:PROFILE_TOP_ALLOCATIONS]:
+            f.write(f"{stat.size / 1024:.1f} KiB in {stat.count} blocks\n")
+            for line in stat.traceback.format():
+                f.write(f"  {line}\n")
+            f.write("\n")
+    with open(os.path.join(session.out_dir, "requests.jsonl"), "w") as f:
+        for record in session.records:
+            f.write(json.dumps(record) + "\n")
+    logger.info("Profile written to %s", session.out_dir)
+
+
+def profiled(name: str):
+    """Decorator for request entry points; records the call if a session is active."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            session = _session
+            if session is None:
+                return fn(*args, **kwargs)
+            wall, cpu = time.perf_counter(), time.process_time()
+            tracemalloc.reset_peak()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _record(session, {
+                    "request": name,
+                    "wall_ms": round((time.perf_counter() - wall) * 1000, 1),
+                    "cpu_ms": round((time.process_time() - cpu) * 1000, 1),
+                    "peak_traced_kb": round(tracemalloc.get_traced_memory()[1] / 1024, 1),
+                })
+        return wrapper
+    return decorator
+
+
+def _record(session: _Session, record: dict):
+    global _session
+    with session.lock:
+        if session.remaining <= 0:
+            return  # session already finishing (concurrent requests)
+        session.records.append(record)
+        session.remaining -= 1
+        done = session.remaining == 0
+    if done:
+        with _session_lock:
+            _session = None
+        _finish(session)
@@ -0,0 +1,195 @@
+"""
+Opt-in background frame sampler: keeps the last few screen frames already
+PNG-encoded, so a capture hotkey can skip the encode step.
+
+Frames are grabbed at a low rate, hashed, and encoded only if the hash is
+new (deduplicated ring buffer of raw PNG bytes, capped by frame count and
+bytes). When the screen stays static the sampling interval backs off, and once
+it is still static at SAMPLER_MAX_INTERVAL_S the sampler suspends — no grabs
+or hashes at all — until wake() (called on any key press and on capture).
+While a request is in flight (is_busy) sampling pauses too. The interval is
+also stretched so the sampler thread stays under SAMPLER_MAX_CPU of one core.
+"""
+import base64
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from PIL import Image
+
+import metrics
+from capture import encode_png, grab
+from config import (
+    SAMPLER_INTERVAL_S, SAMPLER_MAX_INTERVAL_S, SAMPLER_STATIC_AFTER, SAMPLER_MAX_FRAMES,
+    SAMPLER_MAX_BYTES, SAMPLER_MAX_CPU, SAMPLER_VERIFY, SAMPLER_MAX_AGE_S,
+)
+
+logger = logging.getLogger(__name__)
+
+_STATS_LOG_INTERVAL_S = 60.0
+
+
+@dataclass
+class Frame:
+    digest: bytes
+    captured_at: float   # time.monotonic()
+    png: bytes
+
+
+def frame_digest(img: Image.Image) -> bytes:
+    return hashlib.blake2b(img.tobytes(), digest_size=16).digest()
+
+
+class FrameSampler:
+    """Background sampler thread; use current_frame() from the capture hotkey."""
+
+    def __init__(self, is_busy=lambda: False):
+        self._is_busy = is_busy
+        self._frames = OrderedDict()  # digest -> Frame, oldest first
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._suspended = False
+        self._thread = None
+        self._interval = SAMPLER_INTERVAL_S
+        self._unchanged = 0
+        self._last_digest = None
+        self._cpu_s = 0.0
+        self._started = None
+
+    # ── Lifecycle ─────────────────────────────────────────────────────────
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._started = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="frame-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def wake(self):
+        """Resumes sampling after a static-screen suspend (cheap; call on any input)."""
+        self._wake.set()
+
+    def _run(self):
+        last_log = time.monotonic()
+        while not self._stop.is_set():
+            if self._suspended:
+                self._wake.wait()
+                self._wake.clear()
+                self._suspended = False
+                self._interval = SAMPLER_INTERVAL_S
+                self._unchanged = 0
+                metrics.incr("sampler.resumes")
+                continue
+            if self._is_busy():
+                self._stop.wait(SAMPLER_INTERVAL_S)
+                continue
+            cpu_before = time.thread_time()
+            try:
+                self._sample()
+            except Exception as e:
+                logger.warning("Frame sampler grab failed: %s", e)
+            work_s = time.thread_time() - cpu_before
+            self._cpu_s += work_s
+            metrics.observe("sampler.cycle_cpu_ms", work_s * 1000)
+            # Sleep long enough that work / (work + sleep) stays under the CPU budget
+            sleep_s = max(self._interval, work_s / SAMPLER_MAX_CPU - work_s)
+            if time.monotonic() - last_log >= _STATS_LOG_INTERVAL_S:
+                logger.info("Frame sampler: %s", self.stats())
+                last_log = time.monotonic()
+            self._stop.wait(sleep_s)
+
+    def _sample(self):
+        img = grab()
+        digest = frame_digest(img)
+        if digest == self._last_digest:
+            self._unchanged += 1
+            if self._unchanged >= SAMPLER_STATIC_AFTER:
+                if self._interval >= SAMPLER_MAX_INTERVAL_S:
+                    # Still static after backing off fully: stop grabbing until wake()
+                    self._wake.clear()
+                    self._suspended = True
+                    metrics.incr("sampler.suspends")
+                    return
+                # Static screen: back off towards SAMPLER_MAX_INTERVAL_S
+                self._interval = min(SAMPLER_MAX_INTERVAL_S, self._interval * 2)
+            return
+        self._last_digest = digest
+        self._unchanged = 0
+        self._interval = SAMPLER_INTERVAL_S
+        with self._lock:
+            if digest in self._frames:
+                # Seen before (e.g. switched back to a window): refresh, no re-encode
+                self._frames[digest].captured_at = time.monotonic()
+                self._frames.move_to_end(digest)
+                metrics.incr("sampler.dedup")
+                return
+        self._store(Frame(digest, time.monotonic(), encode_png(img)))
+
+    def _store(self, frame: Frame):
+        with self._lock:
+            self._frames[frame.digest] = frame
+            self._bytes += len(frame.png)
+            while self._frames and (len(self._frames) > SAMPLER_MAX_FRAMES or self._bytes > SAMPLER_MAX_BYTES):
+                _, evicted = self._frames.popitem(last=False)
+                self._bytes -= len(evicted.png)
+
+    # ── Hotkey side ───────────────────────────────────────────────────────
+
+    def current_frame(self) -> tuple[Image.Image | None, str | None]:
+        """
+        Returns (img, png_b64) for the screen as of now. Also wakes a suspended sampler.
+
+        With SAMPLER_VERIFY the screen is grabbed and hashed (cheap next to a
+        PNG encode): if it matches a buffered frame, that frame's encoding is
+        reused, otherwise png_b64 is None and the caller encodes img.
+        Without it, the newest frame younger than SAMPLER_MAX_AGE_S is returned
+        as (None, png_b64) with no grab at all.
+        """
+        self.wake()
+        if not SAMPLER_VERIFY:
+            with self._lock:
+                frame = next(reversed(self._frames.values()), None)
+            if frame and time.monotonic() - frame.captured_at <= SAMPLER_MAX_AGE_S:
+                metrics.incr("sampler.hits")
+                return None, _b64(frame.png)
+            metrics.incr("sampler.misses")
+            return grab(), None
+
+        img = grab()
+        digest = frame_digest(img)
+        with self._lock:
+            frame = self._frames.get(digest)
+        if frame:
+            metrics.incr("sampler.hits")
+            return img, _b64(frame.png)
+        metrics.incr("sampler.misses")
+        return img, None
+
+    def stats(self) -> dict:
+        """Frames held, memory used, sampler CPU share and current interval."""
+        with self._lock:
+            frames, used = len(self._frames), self._bytes
+        elapsed = time.monotonic() - self._started if self._started else 0
+        return {
+            "frames": frames,
+            "bytes": used,
+            "cpu_percent": round(100 * self._cpu_s / elapsed, 2) if elapsed else 0.0,
+            "interval_s": self._interval,
+            "suspended": self._suspended,
+        }
+
+
+def _b64(png: bytes) -> str:
+    return base64.standard_b64encode(png).decode()
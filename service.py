@@ -0,0 +1,288 @@
+"""
+Local IPC service exposing the capture-and-ask pipeline over localhost HTTP.
+
+Responses stream as server-sent events:
+    event: start   data: {"conversation_id": "..."}
+    event: token   data: {"text": "..."}            (one per streamed chunk)
+    event: done    data: {"conversation_id", "stop_reason", "usage", ...}
+    event: error   data: {"error": "..."}
+
+Endpoints (JSON request bodies, "mode" defaults to Interview):
+    GET  /health
+    POST /capture    {"mode"}                          capture the main screen and ask
+    POST /ask        {"text" | "image", "mode"}        image is base64 PNG
+    POST /followup   {"conversation_id", "text"}
+
+Every request must carry `Authorization: Bearer <token>`, where the token is
+read from SERVICE_TOKEN_FILE (created with mode 0600 on first start; e.g.
+`curl -H "Authorization: Bearer $(cat ~/.interview_assistant/service_token)"`).
+Requests with an Origin header or a Host other than 127.0.0.1/localhost:<port>
+are rejected, and POST bodies must be application/json — so web pages cannot
+trigger captures, even through DNS rebinding.
+
+main.py starts this in-process when SERVICE_ENABLED is set, so local clients
+share the overlay's warm model backend and MAX_CONCURRENT_STREAMS cap.
+Run `python service.py` for a headless service without the overlay.
+"""
+import base64
+import hmac
+import json
+import logging
+import os
+import secrets
+import stat
+import threading
+import uuid
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import metrics
+from bedrock import ask_claude, ask_claude_text, ask_claude_followup
+from capture import capture_screen
+from config import PROMPTS, PROMPT_NAMES, TEXT_PROMPTS, MODE_LIMITS, SERVICE_HOST, SERVICE_PORT, SERVICE_TOKEN_FILE
+
+logger = logging.getLogger(__name__)
+
+_MAX_CONVERSATIONS = 32  # oldest follow-up histories are dropped beyond this
+_STRING_FIELDS = ("mode", "text", "image", "conversation_id")
+
+_conversations = OrderedDict()  # conversation_id -> list of Bedrock message dicts
+_conversations_lock = threading.Lock()
+
+
+def _save_conversation(conversation_id: str, messages: list):
+    with _conversations_lock:
+        _conversations[conversation_id] = messages
+        _conversations.move_to_end(conversation_id)
+        while len(_conversations) > _MAX_CONVERSATIONS:
+            _conversations.popitem(last=False)
+
+
+def load_token(path: str = SERVICE_TOKEN_FILE) -> str:
+    """Reads the service token, creating it (mode 0600) if missing. Refuses a group/world-readable file."""
+    path = os.path.expanduser(path)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(secrets.token_urlsafe(32))
+        logger.info("Created service token at %s", path)
+    mode = os.stat(path).st_mode
+    if mode & (stat.S_IRWXG | stat.S_IRWXO):
+        raise RuntimeError(f"{path} must not be accessible by group/others (chmod 600 it)")
+    with open(path) as f:
+        token = f.read().strip()
+    if not token:
+        raise RuntimeError(f"{path} is empty")
+    return token
+
+
+def _image_content(image_b64: str) -> list:
+    """The user turn ask_claude() sends for image_b64; raises ValueError if it is not base64."""
+    image_bytes = base64.b64decode(image_b64, validate=True)
+    return [
+        {"image": {"format": "png", "source": {"bytes": image_bytes}}},
+        {"text": "Solve this problem."},
+    ]
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host: str, port: int, token: str):
+        super().__init__((host, port), _Handler)
+        self.token = token
+        port = self.server_address[1]
+        self.allowed_hosts = {f"127.0.0.1:{port}", f"localhost:{port}", f"{host}:{port}"}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "InterviewAssistant/1.0"
+
+    def log_message(self, fmt, *args):
+        logger.info("%s - %s", self.address_string(), fmt % args)
+
+    def _authorized(self) -> bool:
+        """Rejects browser-originated and unauthenticated requests; sends the error response."""
+        if self.headers.get("Origin") is not None:
+            self._send_json(403, {"error": "cross-origin requests are not allowed"})
+        elif (self.headers.get("Host") or "").lower() not in self.server.allowed_hosts:
+            self._send_json(403, {"error": "unexpected Host header"})
+        elif not hmac.compare_digest(self.headers.get("Authorization") or "", f"Bearer {self.server.token}"):
+            self._send_json(401, {"error": "missing or invalid bearer token"})
+        else:
+            return True
+        metrics.incr("service.rejected")
+        return False
+
+    # ── Routing ───────────────────────────────────────────────────────────
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        if self.path != "/health":
+            self.send_error(404)
+            return
+        self._send_json(200, {"status": "ok", "modes": PROMPT_NAMES, "metrics": metrics.snapshot()})
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        content_type = (self.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+        if content_type != "application/json":
+            self._send_json(415, {"error": "Content-Type must be application/json"})
+            return
+        routes = {"/capture": self._capture, "/ask": self._ask, "/followup": self._followup}
+        route = routes.get(self.path)
+        if route is None:
+            self.send_error(404)
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(body, dict):
+                raise ValueError("request body must be a JSON object")
+            for field in _STRING_FIELDS:
+                if field in body and not isinstance(body[field], str):
+                    raise ValueError(f"'{field}' must be a string")
+            mode = body.get("mode", PROMPT_NAMES[0])
+            if mode not in PROMPTS:
+                raise ValueError(f"unknown mode '{mode}' (expected one of {PROMPT_NAMES})")
+            body["mode"] = mode
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+            return
+        metrics.incr(f"service.requests{self.path.replace('/', '.')}")
+        route(body)
+
+    # ── Operations ────────────────────────────────────────────────────────
+
+    def _capture(self, body: dict):
+        mode = body["mode"]
+        try:
+            image_b64 = capture_screen()
+        except Exception as e:
+            self._send_json(500, {"error": f"capture failed: {e}"})
+            return
+        self._run(
+            lambda on_token, stop: ask_claude(
+                image_b64, on_token, prompt=PROMPTS[mode], limits=MODE_LIMITS[mode], stop_event=stop),
+            history=[], user_content=_image_content(image_b64),
+        )
+
+    def _ask(self, body: dict):
+        mode = body["mode"]
+        if body.get("image"):
+            try:
+                user_content = _image_content(body["image"])
+            except ValueError as e:
+                self._send_json(400, {"error": f"'image' is not valid base64: {e}"})
+                return
+            self._run(
+                lambda on_token, stop: ask_claude(
+                    body["image"], on_token, prompt=PROMPTS[mode], limits=MODE_LIMITS[mode],
+                    stop_event=stop),
+                history=[], user_content=user_content,
+            )
+        elif body.get("text"):
+            self._run(
+                lambda on_token, stop: ask_claude_text(
+                    body["text"], on_token, prompt=TEXT_PROMPTS[mode], limits=MODE_LIMITS[mode],
+                    stop_event=stop),
+                history=[], user_content=[{"text": body["text"]}],
+            )
+        else:
+            self._send_json(400, {"error": "expected 'text' or 'image'"})
+
+    def _followup(self, body: dict):
+        conversation_id, text = body.get("conversation_id"), body.get("text")
+        with _conversations_lock:
+            history = list(_conversations.get(conversation_id, []))
+        if not history or not text:
+            self._send_json(400, {"error": "expected a known 'conversation_id' and 'text'"})
+            return
+        user_content = [{"text": text}]
+        messages = history + [{"role": "user", "content": user_content}]
+        self._run(
+            lambda on_token, stop: ask_claude_followup(messages, on_token, stop_event=stop),
+            history=history, user_content=user_content, conversation_id=conversation_id,
+        )
+
+    def _run(self, ask, history: list, user_content: list, conversation_id: str = None):
+        """
+        Stream ask() as SSE and record the exchange for follow-ups. user_content
+        is the user turn as asked (image block included), so follow-ups see it.
+        """
+        conversation_id = conversation_id or uuid.uuid4().hex
+        stop = threading.Event()  # set when the client goes away
+        parts = []
+
+        def on_token(token: str):
+            parts.append(token)
+            if not stop.is_set():
+                try:
+                    self._send_event("token", {"text": token})
+                except OSError:
+                    stop.set()
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        try:
+            self._send_event("start", {"conversation_id": conversation_id})
+            result = ask(on_token, stop)
+        except OSError:
+            return
+        except Exception as e:  # Bedrock errors, bad base64 image, ...
+            logger.warning("Service request failed: %s", e)
+            self._try_send_event("error", {"error": str(e)})
+            return
+
+        _save_conversation(conversation_id, history + [
+            {"role": "user", "content": user_content},
+            {"role": "assistant", "content": [{"text": "".join(parts)}]},
+        ])
+        self._try_send_event("done", {"conversation_id": conversation_id, **result})
+
+    # ── Output helpers ────────────────────────────────────────────────────
+
+    def _send_json(self, status: int, payload: dict):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_event(self, event: str, payload: dict):
+        self.wfile.write(f"event: {event}\ndata: {json.dumps(payload)}\n\n".encode())
+        self.wfile.flush()
+
+    def _try_send_event(self, event: str, payload: dict):
+        try:
+            self._send_event(event, payload)
+        except OSError:
+            pass
+
+
+def start_service(host: str = SERVICE_HOST, port: int = SERVICE_PORT,
+                  token: str = None) -> ThreadingHTTPServer:
+    """
+    Starts the service on a daemon thread and returns the server (call shutdown() to stop).
+    token defaults to the one in SERVICE_TOKEN_FILE.
+    """
+    server = _Server(host, port, token or load_token())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.info("Service listening on http://%s:%d", host, port)
+    return server
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    server = _Server(SERVICE_HOST, SERVICE_PORT, load_token())
+    print(f"🔌 Service listening on http://{SERVICE_HOST}:{SERVICE_PORT} (token: {SERVICE_TOKEN_FILE})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,139 @@
+"""
+OpenAICompatBackend against a fake OpenAI-compatible server (stdlib only).
+Runs headless: nothing here imports pynput or the AWS SDK.
+
+    python -m unittest discover tests
+"""
+import json
+import os
+import sys
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import backends  # noqa: E402
+import bedrock  # noqa: E402
+
+
+def _chunk(content=None, finish_reason=None) -> dict:
+    delta = {"content": content} if content is not None else {}
+    return {"choices": [{"delta": delta, "finish_reason": finish_reason}]}
+
+
+class _FakeServer(ThreadingHTTPServer):
+    """
+    Serves /v1/models and /v1/chat/completions. Each POST pops the next
+    scripted response: ("stream", [chunk, ...], complete) or ("status", code, body).
+    Request bodies are kept in .requests.
+    """
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _FakeHandler)
+        self.script = []
+        self.requests = []
+
+
+class _FakeHandler(BaseHTTPRequestHandler):
+    def log_message(self, fmt, *args):
+        pass
+
+    def do_GET(self):
+        body = json.dumps({"data": [{"id": "local"}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        self.server.requests.append(json.loads(self.rfile.read(int(self.headers["Content-Length"]))))
+        kind, *rest = self.server.script.pop(0)
+        if kind == "status":
+            code, body = rest
+            self.send_response(code)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        chunks, complete = rest
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for chunk in chunks:
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        if complete:
+            self.wfile.write(b"data: [DONE]\n\n")
+        # Not complete: the connection just closes (truncated stream)
+
+
+class OpenAICompatBackendTest(unittest.TestCase):
+    def setUp(self):
+        self.server = _FakeServer()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.backend = backends.OpenAICompatBackend(
+            base_url=f"http://127.0.0.1:{self.server.server_port}", api_key=None, timeout=5)
+        patcher = mock.patch.object(bedrock, "get_backend", lambda name=None: self.backend)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_streams_text_and_usage(self):
+        self.server.script.append(("stream", [
+            _chunk("Hel"), _chunk("lo"), _chunk(finish_reason="stop"),
+            {"choices": [], "usage": {"prompt_tokens": 7, "completion_tokens": 2}},
+        ], True))
+        tokens = []
+        result = bedrock.ask_claude_text("hi", tokens.append)
+        self.assertEqual("".join(tokens), "Hello")
+        self.assertEqual(result["stop_reason"], "end_turn")
+        self.assertEqual(result["usage"], {"inputTokens": 7, "outputTokens": 2})
+        request = self.server.requests[0]
+        self.assertTrue(request["stream"])
+        self.assertEqual(request["messages"][0]["role"], "system")
+        self.assertEqual(request["messages"][1], {"role": "user", "content": "hi"})
+
+    def test_length_maps_to_max_tokens(self):
+        self.server.script.append(("stream", [_chunk("x"), _chunk(finish_reason="length")], True))
+        result = bedrock.ask_claude_text("hi", lambda token: None)
+        self.assertEqual(result["stop_reason"], "max_tokens")
+
+    def test_image_sent_as_data_uri(self):
+        self.server.script.append(("stream", [_chunk("ok"), _chunk(finish_reason="stop")], True))
+        bedrock.ask_claude("iVBORw0K", lambda token: None)
+        parts = self.server.requests[0]["messages"][1]["content"]
+        self.assertEqual(parts[0]["type"], "image_url")
+        self.assertTrue(parts[0]["image_url"]["url"].startswith("data:image/png;base64,iVBORw0K"))
+        self.assertEqual(parts[1], {"type": "text", "text": "Solve this problem."})
+
+    def test_429_maps_to_throttled(self):
+        self.server.script.append(("status", 429, b"slow down"))
+        with self.assertRaises(bedrock.BedrockThrottled):
+            bedrock.ask_claude_text("hi", lambda token: None)
+
+    def test_server_error_maps_to_runtime_error(self):
+        self.server.script.append(("status", 500, b"boom"))
+        with self.assertRaisesRegex(RuntimeError, r"Local model error \(500\)"):
+            bedrock.ask_claude_text("hi", lambda token: None)
+
+    def test_truncated_stream_is_not_resumed(self):
+        # No prefill support: resuming would restart the answer and duplicate it
+        self.server.script += [("stream", [_chunk("Hello")], False)] * 3
+        tokens = []
+        with self.assertRaisesRegex(RuntimeError, "Model stream interrupted"):
+            bedrock.ask_claude_text("hi", tokens.append)
+        self.assertEqual("".join(tokens), "Hello")
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_health(self):
+        self.backend.health()
+        dead = backends.OpenAICompatBackend(base_url="http://127.0.0.1:9", timeout=1)
+        with self.assertRaisesRegex(RuntimeError, "unreachable"):
+            dead.health()
+
+
+if __name__ == "__main__":
+    unittest.main()
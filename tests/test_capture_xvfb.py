@@ -0,0 +1,103 @@
+"""
+XShmBackend against a real X server: a private Xvfb started for this module.
+Skipped when Xvfb is not installed (e.g. `apt install xvfb` to run it).
+
+    python -m unittest discover tests
+"""
+import os
+import shutil
+import subprocess
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import capture  # noqa: E402
+import capture_backends  # noqa: E402
+from capture_backends import MssBackend, XShmBackend  # noqa: E402
+
+XVFB = shutil.which("Xvfb")
+SCREEN = (640, 480)
+
+
+def _shm_segments() -> int:
+    with open("/proc/sysvipc/shm") as f:
+        return len(f.readlines()) - 1  # minus the header
+
+
+@unittest.skipUnless(XVFB, "Xvfb not installed")
+class XShmBackendXvfbTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # -displayfd: Xvfb picks a free display and writes its number once it accepts clients.
+        # -retro: stippled root window, so grabs have varied pixels to compare
+        read_fd, write_fd = os.pipe()
+        cls.xvfb = subprocess.Popen(
+            [XVFB, "-displayfd", str(write_fd), "-screen", "0", f"{SCREEN[0]}x{SCREEN[1]}x24",
+             "-retro", "-nolisten", "tcp"],
+            pass_fds=(write_fd,), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        os.close(write_fd)
+        with os.fdopen(read_fd) as f:
+            display = f.readline().strip()
+        if not display:
+            cls.xvfb.kill()
+            cls.xvfb.wait()
+            raise unittest.SkipTest("Xvfb failed to start")
+        cls.env = mock.patch.dict(os.environ, {"DISPLAY": f":{display}"})
+        cls.env.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.env.stop()
+        cls.xvfb.terminate()
+        cls.xvfb.wait(timeout=10)
+
+    def setUp(self):
+        self.backend = XShmBackend()
+        self.addCleanup(self.backend.close)
+
+    def assertSameImage(self, region: dict):
+        expected = MssBackend().grab(region)
+        actual = self.backend.grab(region)
+        self.assertEqual(actual.size, (region["width"], region["height"]))
+        self.assertEqual(actual.mode, "RGB")
+        self.assertEqual(actual.tobytes(), expected.tobytes())
+
+    def test_matches_mss(self):
+        region = {"left": 0, "top": 0, "width": SCREEN[0], "height": SCREEN[1]}
+        extrema = MssBackend().grab(region).getextrema()
+        self.assertTrue(any(low != high for low, high in extrema), "screen is uniform")
+        self.assertSameImage(region)
+        self.assertEqual(self.backend.main_monitor(), MssBackend().main_monitor())
+
+    def test_reallocates_on_size_change(self):
+        self.assertSameImage({"left": 0, "top": 0, "width": 200, "height": 100})
+        self.assertSameImage({"left": 13, "top": 7, "width": 97, "height": 61})  # smaller, odd-sized region
+        self.assertSameImage({"left": 0, "top": 0, "width": 200, "height": 100})
+
+    def test_off_screen_region_falls_back_to_mss(self):
+        region = {"left": SCREEN[0] - 50, "top": 0, "width": 100, "height": 100}
+        with self.assertRaises(RuntimeError):
+            self.backend.grab(region)
+        self.assertSameImage({"left": 0, "top": 0, "width": 100, "height": 100})  # still usable after
+
+        fallback = object()
+        with mock.patch.object(capture_backends, "_backend", self.backend), \
+                mock.patch.object(MssBackend, "grab", return_value=fallback) as mss_grab:
+            self.assertIs(capture.grab(region), fallback)
+        mss_grab.assert_called_once_with(region)
+
+    def test_close_releases_segment(self):
+        before = _shm_segments()
+        backend = XShmBackend()
+        backend.grab({"left": 0, "top": 0, "width": 320, "height": 240})
+        self.assertEqual(_shm_segments(), before + 1)
+        backend.close()
+        self.assertEqual(_shm_segments(), before)
+        backend.close()  # idempotent
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+"""
+service.py request validation and follow-up history, against a scripted
+fake model backend (no network, no AWS SDK).
+
+    python -m unittest discover tests
+"""
+import base64
+import http.client
+import json
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import backends  # noqa: E402
+import bedrock  # noqa: E402
+import service  # noqa: E402
+
+TOKEN = "test-token"
+PNG = b"\x89PNG\r\n\x1a\n fake"
+
+
+class _EchoBackend(backends.ModelBackend):
+    """Answers every request with "ok", recording the messages it was sent."""
+
+    name = "fake"
+    default_model = "fake-model"
+
+    def __init__(self):
+        self.requests = []
+
+    def open_stream(self, model_id, system, messages, inference_config):
+        self.requests.append(messages)
+        return iter([
+            {"contentBlockDelta": {"delta": {"text": "ok"}}},
+            {"messageStop": {"stopReason": "end_turn"}},
+        ])
+
+
+class ServiceTest(unittest.TestCase):
+    def setUp(self):
+        self.backend = _EchoBackend()
+        patcher = mock.patch.object(bedrock, "get_backend", lambda name=None: self.backend)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.server = service.start_service("127.0.0.1", 0, token=TOKEN)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def _post(self, path: str, body) -> tuple[int, str]:
+        conn = http.client.HTTPConnection("127.0.0.1", self.server.server_port, timeout=5)
+        self.addCleanup(conn.close)
+        conn.request("POST", path, json.dumps(body), {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {TOKEN}",
+        })
+        response = conn.getresponse()
+        return response.status, response.read().decode()
+
+    @staticmethod
+    def _events(stream: str) -> dict:
+        events = {}
+        for chunk in stream.strip().split("\n\n"):
+            name, data = chunk.split("\n", 1)
+            events[name[len("event: "):]] = json.loads(data[len("data: "):])
+        return events
+
+    def test_non_string_fields_are_rejected(self):
+        for field, value in [("mode", ["Interview"]), ("text", 1), ("image", {}), ("conversation_id", 7)]:
+            body = {"text": "hi", field: value}
+            status, payload = self._post("/ask" if field != "conversation_id" else "/followup", body)
+            self.assertEqual(status, 400, field)
+            self.assertIn(f"'{field}' must be a string", payload)
+        self.assertEqual(self.backend.requests, [])
+
+    def test_invalid_base64_image_is_rejected(self):
+        status, payload = self._post("/ask", {"image": "not base64!"})
+        self.assertEqual(status, 400)
+        self.assertIn("not valid base64", payload)
+
+    def test_followup_history_keeps_image(self):
+        status, stream = self._post("/ask", {"image": base64.b64encode(PNG).decode()})
+        self.assertEqual(status, 200)
+        conversation_id = self._events(stream)["done"]["conversation_id"]
+
+        status, stream = self._post("/followup", {"conversation_id": conversation_id, "text": "and now?"})
+        self.assertEqual(status, 200)
+        self.assertIn("done", self._events(stream))
+        first_turn = self.backend.requests[1][0]
+        self.assertEqual(first_turn["content"][0]["image"]["source"]["bytes"], PNG)
+        self.assertEqual(first_turn["content"][1], {"text": "Solve this problem."})
+        self.assertEqual(self.backend.requests[1][-1], {"role": "user", "content": [{"text": "and now?"}]})
+
+
+if __name__ == "__main__":
+    unittest.main()
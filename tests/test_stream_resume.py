@@ -0,0 +1,93 @@
+"""
+bedrock._stream() resuming a broken stream with a prefilled continuation,
+against a scripted fake backend (no network, no AWS SDK).
+
+    python -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import backends  # noqa: E402
+import bedrock  # noqa: E402
+from config import STREAM_MAX_RESUMES  # noqa: E402
+
+LIMITS = {"max_tokens": 1000, "stop_sequences": [], "stop_on_sections": False}
+
+
+def _delta(text: str) -> dict:
+    return {"contentBlockDelta": {"delta": {"text": text}}}
+
+
+def _events(deltas, stop_reason=None, usage=None):
+    """Yields deltas, then either messageStop/metadata or a broken connection."""
+    for text in deltas:
+        yield _delta(text)
+    if stop_reason is None:
+        raise ConnectionResetError("connection reset by peer")
+    yield {"messageStop": {"stopReason": stop_reason}}
+    yield {"metadata": {"usage": usage or {}}}
+
+
+class _PrefillBackend(backends.ModelBackend):
+    """Continues a trailing assistant message; each open_stream pops the next script entry."""
+
+    name = "fake"
+    default_model = "fake-model"
+    supports_prefill = True
+
+    def __init__(self, script):
+        self.script = list(script)
+        self.requests = []  # (messages, inference_config) per open_stream
+
+    def open_stream(self, model_id, system, messages, inference_config):
+        self.requests.append((messages, inference_config))
+        return _events(*self.script.pop(0))
+
+
+class StreamResumeTest(unittest.TestCase):
+    def _run(self, script):
+        self.backend = _PrefillBackend(script)
+        tokens = []
+        with mock.patch.object(bedrock, "get_backend", lambda name=None: self.backend):
+            result = bedrock.ask_claude_text("hi", tokens.append, limits=LIMITS)
+        return "".join(tokens), result
+
+    def test_resumes_with_stripped_prefill(self):
+        shown = "def f():\n    "
+        text, result = self._run([
+            (["def f", "():\n    "],),
+            (["\n    return 1"], "end_turn", {"inputTokens": 5, "outputTokens": 4}),
+        ])
+
+        # Bedrock rejects trailing whitespace in a prefill; the shown whitespace is not repeated
+        messages, config = self.backend.requests[1]
+        self.assertEqual(messages[-1], {"role": "assistant", "content": [{"text": shown.rstrip()}]})
+        self.assertEqual(text, "def f():\n    return 1")
+
+        self.assertEqual(self.backend.requests[0][1]["maxTokens"], LIMITS["max_tokens"])
+        self.assertEqual(config["maxTokens"], LIMITS["max_tokens"] - bedrock._estimate_tokens(shown.rstrip()))
+        self.assertEqual(result["stop_reason"], "end_turn")
+        self.assertEqual(result["resumes"], 1)
+        self.assertEqual(result["tokens_saved"], bedrock._estimate_tokens(shown))
+
+    def test_gives_up_after_max_resumes(self):
+        script = [(["chunk "],)] * (STREAM_MAX_RESUMES + 1)
+        with self.assertRaisesRegex(ConnectionResetError, "reset"):
+            self._run(script)
+        self.assertEqual(len(self.backend.requests), STREAM_MAX_RESUMES + 1)
+
+    def test_no_resume_without_prefill_support(self):
+        backend = _PrefillBackend([(["partial"],)])
+        backend.supports_prefill = False
+        with mock.patch.object(bedrock, "get_backend", lambda name=None: backend):
+            with self.assertRaises(ConnectionResetError):
+                bedrock.ask_claude_text("hi", lambda token: None, limits=LIMITS)
+        self.assertEqual(len(backend.requests), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
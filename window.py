@@ -99,6 +99,7 @@ class OverlayWindow:
             yscrollcommand=scrollbar.set,
         )
         self.text.pack(side="left", fill="both", expand=True)
+        self.text.tag_configure("draft", foreground="#8b949e")  # fast-model draft text
         self.text.bind("<Button-1>", self._focus_text)
         scrollbar.config(command=self.text.yview)
 
@@ -171,12 +172,26 @@ class OverlayWindow:
         """Thread-safe: insert token into text area."""
         self.root.after(0, lambda: self._insert(token))
 
-    def _insert(self, token: str):
+    def _insert(self, token: str, *tags):
         at_bottom = self.text.yview()[1] >= 0.95
-        self.text.insert("end", token)
+        self.text.insert("end", token, tags)
         if at_bottom:
             self.text.see("end")
 
+    def stream_draft_token(self, token: str):
+        """Thread-safe: insert a dimmed draft token (removed again by replace_draft)."""
+        self.root.after(0, lambda: self._insert(token, "draft"))
+
+    def replace_draft(self, text: str):
+        """Thread-safe: remove all draft text and insert text in its place."""
+        def _replace():
+            ranges = self.text.tag_ranges("draft")
+            start = ranges[0] if ranges else "end"
+            if ranges:
+                self.text.delete(ranges[0], ranges[-1])
+            self.text.insert(start, text)
+        self.root.after(0, _replace)
+
     def clear(self):
         """Thread-safe: clear the text area."""
         self.root.after(0, lambda: self.text.delete("1.0", "end"))